@@ -1,35 +1,27 @@
-import gymnasium_env.envs.utils.rewards as rewards
-import gymnasium_env.envs.utils.generation as generation
 from gymnasium_env.envs.utils.dtypes import TileType, GenerationType
 
 import os
 import json
 import copy
-import sys 
-
-DEBUG_MODE = False
-if len(sys.argv) > 1 and sys.argv[1] == "debug":
-    DEBUG_MODE = True
-    print("!DEBUG MODE ACTIVATED")
-
-def debug_print(*args):
-    if DEBUG_MODE:
-        print("[DEBUG]", *args)
 
 
 RESULTS_PATH = './results/'
 
 """
-Change environment creation parameters:
+Optional preset for the scripts (train.py, test.py...), the environments
+registered by gymnasium_env do not depend on this module:
 
-    * Set custom reward scenarios in: import gymnasium_env.envs.utils.rewards
+    gym.make("Maze-v0", **get_env_kwargs())
+
+    * Set custom reward scenarios in: gymnasium_env.envs.utils.rewards,
+      and select them by their name in REWARD_STRATEGIES
 
 """
 
 ENV_PARAMS = {
     "game": "maze",
     "representation": "narrow",
-    "reward_strategy": rewards.maze_reward_scenario3,
+    "reward_strategy": "maze_reward_scenario3",
     "action_tiles": [
         TileType.EMPTY, 
         TileType.WALL, 
@@ -49,11 +41,109 @@ ENV_CONFIG = {
     },
     "representation.config": {
         "generation": GenerationType.CUSTOM2,
-        "random_start": True
+        "random_start": True,
+        # Narrow only: egocentric crop_size x crop_size observation window,
+        # cells outside the grid are observed as pad_tile
+        # "crop_size": 5,
+        # "pad_tile": TileType.WALL,
+        # Sample the initial levels from a pool built with
+        # gymnasium_env.envs.utils.level_pool.build_level_pool
+        # "level_pool": "./results/levels.npy",
     },
-    "change_rate": 0.3
+    "change_rate": 0.3,
+    # False returns read-only views of the env state as observations, valid
+    # until the next step or reset (the last one of an episode is a copy)
+    "copy_observations": True,
+    # Observation layout: "dict", "flat" (C, H, W) or "packed" (2, H, W).
+    # train.py picks a CNN policy for "flat" and "packed" (see get_policy)
+    "observation": "dict",
+    # Reuse the stats of already seen grids: False, True, a max number
+    # of grids or {"max_size": 65536, "policy": "lru" | "fifo"}
+    "stats_cache": False,
+    # Keep the shortest path updated incrementally between steps instead
+    # of a full BFS per change (slower than the default bitboard BFS so far)
+    "path_tracker": False,
+    # Debug output of the env: True, False or None to follow the level
+    # of the gymnasium_env logger (gymnasium_env.envs.utils.debug.set_debug)
+    "debug": None
 }  
 
+# Letters of the generation types in the model names
+GENERATION_NAMES = {
+    GenerationType.EMPTY: "E",
+    GenerationType.FULL: "F",
+    GenerationType.RANDOM: "R",
+    GenerationType.DFS: "D",
+    GenerationType.CUSTOM1: "C1",
+    GenerationType.CUSTOM2: "C2",
+}
+
+# PcgrlEnv keyword arguments of this preset
+def get_env_kwargs(env_params=None, env_config=None):
+    kwargs = copy.deepcopy(env_params if env_params is not None else ENV_PARAMS)
+    kwargs["env_config"] = copy.deepcopy(env_config if env_config is not None else ENV_CONFIG)
+    return kwargs
+
+"""
+Reward scenario of the model name, from the name of the reward strategy
+(e.g. maze_reward_scenario3 -> 3) or of the scenario function
+"""
+def get_scenario_name(reward_strategy) -> str:
+    if callable(reward_strategy) and hasattr(reward_strategy, "__name__"):
+        reward_strategy = reward_strategy.__name__
+    if not isinstance(reward_strategy, str):
+        raise ValueError(f"Can not name a model trained with the reward strategy {reward_strategy!r}, "
+                         f"expected a scenario name or function")
+    return reward_strategy.rsplit("scenario", 1)[-1]
+
+"""
+Name of the results folder of a model, as the existing results:
+maze-<algorithm>-<representation><random start>G<generation>R<reward scenario>
+with R (random) or F (fixed) as random start, e.g. maze-ppo-NRGC2R3.
+with_change_rate adds the change rate in percent, e.g. maze-ppo-NRGC2R3-CR30
+"""
+def get_model_name(algorithm: str, env_kwargs=None, with_change_rate: bool = False) -> str:
+    if env_kwargs is None:
+        env_kwargs = get_env_kwargs()
+    env_config = env_kwargs.get("env_config", {})
+    representation_config = env_config.get("representation.config", {})
+    generation = representation_config.get("generation", GenerationType.RANDOM)
+    generation = GenerationType[generation] if isinstance(generation, str) else GenerationType(generation)
+    random_start = "R" if representation_config.get("random_start", True) else "F"
+    scenario = get_scenario_name(env_kwargs.get("reward_strategy", "maze_reward_scenario3"))
+    name = (f"{env_kwargs.get('game', 'maze')}-{algorithm}-"
+            f"{env_kwargs.get('representation', 'narrow')[0].upper()}{random_start}"
+            f"G{GENERATION_NAMES[generation]}R{scenario}")
+    if with_change_rate:
+        name += f"-CR{round(env_config.get('change_rate', 0.2) * 100):02d}"
+    return name
+
+"""
+PcgrlEnv kwargs and algorithm the model was trained with, from the
+configs saved by sweep.py in its folder or from this preset. Without
+train_params.json the algorithm comes from the folder name (see
+get_model_name)
+"""
+def load_run_config(log_dir: str):
+    env_kwargs, algorithm = get_env_kwargs(), None
+    params_path = os.path.join(log_dir, "env_params.json")
+    env_config_path = os.path.join(log_dir, "env_config.json")
+    if os.path.exists(params_path) and os.path.exists(env_config_path):
+        with open(params_path) as f:
+            env_kwargs = json.load(f)
+        with open(env_config_path) as f:
+            env_kwargs["env_config"] = json.load(f)
+    train_params_path = os.path.join(log_dir, "train_params.json")
+    if os.path.exists(train_params_path):
+        with open(train_params_path) as f:
+            algorithm = json.load(f).get("algorithm")
+    if algorithm is None:
+        parts = os.path.basename(os.path.normpath(log_dir)).split("-")
+        if len(parts) < 2:
+            raise ValueError(f"Can not find the algorithm of the model in {log_dir}")
+        algorithm = parts[1]
+    return env_kwargs, algorithm.lower()
+
 def config_path():
     os.makedirs('./results/', exist_ok=True)
 
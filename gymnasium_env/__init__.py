@@ -1,17 +1,66 @@
 from gymnasium.envs.registration import register
 
+from gymnasium_env.envs.utils.dtypes import TileType, GenerationType
 
-from config import ENV_PARAMS, ENV_CONFIG
+import copy
 
 
-register(
-    id="Maze-v0",
-    entry_point="gymnasium_env.envs:PcgrlEnv",
-    kwargs={
-        "game": ENV_PARAMS["game"],
-        "representation": ENV_PARAMS["representation"],
-        "reward_strategy": ENV_PARAMS["reward_strategy"](),
-        "action_tiles": ENV_PARAMS["action_tiles"],
-        "env_config": ENV_CONFIG
-    }
-)
\ No newline at end of file
+"""
+Registered environments, each preset holds the PcgrlEnv keyword arguments.
+Any of them can be overridden on creation, e.g.
+gym.make("Maze-v0", reward_strategy="maze_reward_scenario4")
+"""
+MAZE_CONFIG = {
+    "game.config": {
+        "height": 6,
+        "width": 6,
+        "render_mode": "human",
+        "render_type": "step",
+        "render_ws_width": 640,
+        "render_ws_height": 480,
+    },
+    "representation.config": {
+        "generation": GenerationType.CUSTOM2,
+        "random_start": True,
+    },
+    "change_rate": 0.3,
+    "copy_observations": True,
+    "observation": "dict",
+    "debug": None,
+}
+
+PRESETS = {
+    "Maze-v0": {
+        "game": "maze",
+        "representation": "narrow",
+        "reward_strategy": "maze_reward_scenario3",
+        "action_tiles": [TileType.EMPTY, TileType.WALL],
+        "env_config": MAZE_CONFIG,
+    },
+    "MazeWide-v0": {
+        "game": "maze",
+        "representation": "wide",
+        "reward_strategy": "maze_reward_scenario4",
+        "action_tiles": [TileType.EMPTY, TileType.WALL, TileType.START, TileType.END],
+        "env_config": {
+            **MAZE_CONFIG,
+            "representation.config": {"generation": GenerationType.CUSTOM1},
+        },
+    },
+    "MazeTurtle-v0": {
+        "game": "maze",
+        "representation": "turtle",
+        "reward_strategy": "maze_reward_scenario3",
+        "action_tiles": [TileType.EMPTY, TileType.WALL],
+        "env_config": MAZE_CONFIG,
+    },
+}
+
+
+for env_id, kwargs in PRESETS.items():
+    register(
+        id=env_id,
+        entry_point="gymnasium_env.envs:PcgrlEnv",
+        vector_entry_point="gymnasium_env.envs:PcgrlVectorEnv",
+        kwargs=copy.deepcopy(kwargs),
+    )
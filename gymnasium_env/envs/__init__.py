@@ -1 +1,2 @@
-from gymnasium_env.envs.pcg_env import PcgrlEnv
\ No newline at end of file
+from gymnasium_env.envs.pcg_env import PcgrlEnv
+from gymnasium_env.envs.pcg_vector_env import PcgrlVectorEnv
\ No newline at end of file
@@ -90,6 +90,11 @@ class GridWorld:
     # Render the game using grid values
     def render(self, grid):
         raise NotImplementedError('render is not implemented')
+
+
+    # Render a batch of grids (N, H, W) into rgb frames
+    def render_batch(self, grids):
+        raise NotImplementedError('render_batch is not implemented')
     
     
     # Close game rendering
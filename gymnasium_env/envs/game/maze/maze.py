@@ -2,18 +2,32 @@ from ..grid_world import GridWorld
 from gymnasium_env.envs.utils.dtypes import *
 
 from gymnasium import spaces
-
 from typing import List, Dict, Optional
 from enum import IntEnum
 
 import random
 import numpy as np
-import pygame
 import os
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SPRITES_PATH = 'sprites'
 
+# RGB color of each TileType, indexed by the tile value
+TILE_COLORS = np.array([
+    (255, 255, 255),    # EMPTY
+    (0, 0, 0),          # WALL
+    (0, 255, 0),        # START
+    (255, 0, 0),        # END
+], dtype=np.uint8)
+GRID_LINE_WIDTH = 1
+
+SPRITE_FILES = {
+    TileType.EMPTY.value: "empty.png",
+    TileType.WALL.value: "wall.png",
+    TileType.START.value: "start.png",
+    TileType.END.value: "end.png",
+}
+
 class Maze(GridWorld):
     def __init__(self,
                  width,
@@ -41,12 +55,11 @@ class Maze(GridWorld):
         self._render_type = render_type
         self._render_ws_width = render_ws_width
         self._render_ws_height = render_ws_height
-        if self._render_mode == "human":
-            pygame.init()
-            pygame.display.init()
-            self._window = pygame.display.set_mode(
-                (self._render_ws_width, self._render_ws_height))
-            self._clock = pygame.time.Clock()
+        # pygame is only imported and initialized on the first human render,
+        # so training processes never touch the display
+        self._window = None
+        self._clock = None
+        self._sprite_tensor = None
         
 
 
@@ -97,105 +110,165 @@ class Maze(GridWorld):
 
     
     def render(self, grid):
-        canvas = pygame.Surface(
+        if self._render_mode == "human":
+            return self._render_human(grid)
+        return self._render_rgb_array(grid)
+
+
+    def _init_window(self):
+        import pygame
+        pygame.init()
+        pygame.display.init()
+        self._window = pygame.display.set_mode(
+            (self._render_ws_width, self._render_ws_height))
+        self._clock = pygame.time.Clock()
+
+        self._tile_w = self._render_ws_width / self.width
+        self._tile_h = self._render_ws_height / self.height
+        self._load_sprites()
+
+        # Persistent canvas, only the tiles that changed since the
+        # last frame are drawn again
+        self._canvas = pygame.Surface(
             (self._render_ws_width, self._render_ws_height))
-        canvas_width, canvas_height = canvas.get_size()
-        canvas.fill((255, 255, 255))
-
-        pix_square_size_w = self._render_ws_width / self.width
-        pix_square_size_h = self._render_ws_height / self.height
-        pix_square_size = min(pix_square_size_w, pix_square_size_h)
-        pix_square_size = int(pix_square_size)
-
-        # Color render
-        tile_colors = {
-            TileType.EMPTY.value: (255, 255, 255),   
-            TileType.START.value: (0, 255, 0),       
-            TileType.END.value: (255, 0, 0),         
-            TileType.WALL.value: (0, 0, 0),          
-        }
-
-        # Image rendering
-        def load_sprite(sprite_name):
+        self._canvas.fill((255, 255, 255))
+        self._rendered_grid = None
+
+
+    # Sprites are loaded from disk and scaled to the tile size only once
+    def _load_sprites(self):
+        import pygame
+        self._sprites = {}
+        for tile, sprite_name in SPRITE_FILES.items():
             img = pygame.image.load(os.path.join(BASE_DIR, SPRITES_PATH, sprite_name)).convert_alpha()
-            img_norm = pygame.transform.scale(img, (
-                pix_square_size_w, pix_square_size_h))
-            return img_norm
-
-        tile_images = {
-            TileType.EMPTY.value: load_sprite("empty.png"),
-            TileType.START.value: load_sprite("start.png"),
-            TileType.END.value: load_sprite("end.png"),
-            TileType.WALL.value: load_sprite("wall.png"),
-        }
-
-        # Draw tile values on screen
-        for y in range(self.height):
-            for x in range(self.width):
-                tile_type = grid[y][x]  
-                sprite = tile_images.get(tile_type)  
-
-                if sprite:
-                    canvas.blit(sprite, (x * pix_square_size_w, y * pix_square_size_h))
-                else:
-                    color = tile_colors.get(tile_type, (128, 128, 128))
-                    rect = pygame.Rect(
-                        x * pix_square_size_w,
-                        y * pix_square_size_h,
-                        pix_square_size,
-                        pix_square_size
-                    )
-                    pygame.draw.rect(canvas, color, rect)
-
-        # Horizontal lines
-        for y in range(self.height + 1):
-            pygame.draw.line(
-                canvas,
-                0,  # COLOR: BLACK 
-                (0, int(pix_square_size_h * y)),
-                (self._render_ws_width, int(pix_square_size_h * y)),
-                width=3,
-            )
-
-        # Vertical lines
-        for x in range(self.width + 1):
-            pygame.draw.line(
-                canvas,
-                0,  # COLOR: BLACK
-                (int(pix_square_size_w * x), 0),
-                (int(pix_square_size_w * x), self._render_ws_height),
-                width=3,
-    )
+            self._sprites[tile] = pygame.transform.scale(img, (self._tile_w, self._tile_h))
 
-        if self._render_mode == "human":
-            # The following line copies our drawings from `canvas` to the visible window
-            self._window.blit(canvas, canvas.get_rect())
-            pygame.event.pump()
-            pygame.display.update()
-
-            # We need to ensure that human-rendering occurs at the predefined framerate.
-            # The following line will automatically add a delay to
-            # keep the framerate stable.
-            # self.clock.tick(4)
-            if self._render_type == "step":
-                waiting = True
-                while waiting:
-                    for event in pygame.event.get():
-                        if event.type == pygame.QUIT:
+
+    def _draw_tile(self, x, y, tile_type):
+        import pygame
+        left, top = x * self._tile_w, y * self._tile_h
+        sprite = self._sprites.get(tile_type)
+        if sprite:
+            self._canvas.blit(sprite, (left, top))
+        else:
+            color = TILE_COLORS[tile_type] if tile_type < len(TILE_COLORS) else (128, 128, 128)
+            pix_square_size = int(min(self._tile_w, self._tile_h))
+            rect = pygame.Rect(left, top, pix_square_size, pix_square_size)
+            pygame.draw.rect(self._canvas, color, rect)
+
+        # Tile borders
+        x0, x1 = int(left), int(left + self._tile_w)
+        y0, y1 = int(top), int(top + self._tile_h)
+        for start, end in (((x0, y0), (x1, y0)), ((x0, y1), (x1, y1)),
+                           ((x0, y0), (x0, y1)), ((x1, y0), (x1, y1))):
+            pygame.draw.line(self._canvas, 0, start, end, width=3)
+
+
+    def _render_human(self, grid):
+        import pygame
+        if self._window is None:
+            self._init_window()
+
+        grid = np.asarray(grid)
+        if self._rendered_grid is None:
+            dirty = np.argwhere(np.ones(grid.shape, dtype=bool))
+        else:
+            dirty = np.argwhere(grid != self._rendered_grid)
+        for y, x in dirty:
+            self._draw_tile(x, y, grid[y, x])
+        self._rendered_grid = grid.copy()
+        canvas = self._canvas
+
+        # The following line copies our drawings from `canvas` to the visible window
+        self._window.blit(canvas, canvas.get_rect())
+        pygame.event.pump()
+        pygame.display.update()
+
+        # We need to ensure that human-rendering occurs at the predefined framerate.
+        # The following line will automatically add a delay to
+        # keep the framerate stable.
+        # self.clock.tick(4)
+        if self._render_type == "step":
+            waiting = True
+            while waiting:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        pygame.quit()
+                        exit()
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_ESCAPE:
                             pygame.quit()
                             exit()
-                        elif event.type == pygame.KEYDOWN:
-                            if event.key == pygame.K_ESCAPE:
-                                pygame.quit()
-                                exit()
-                            else:
-                                waiting = False
-
-        else:  # rgb_array
-            return np.transpose(
-                np.array(pygame.surfarray.pixels3d(canvas)), axes=(1, 0, 2)
-            )
-        
+                        else:
+                            waiting = False
+
+
+    """
+    Pure NumPy rgb_array rendering, does not need pygame nor a display.
+    Frames have shape (height * tile_size, width * tile_size, 3)
+    """
+    def _render_rgb_array(self, grid):
+        return self.render_batch(np.asarray(grid)[None])[0]
+
+
+    """
+    Render a batch of grids with shape (N, H, W) into frames with shape
+    (N, H * tile_size, W * tile_size, 3), with a single gather on the
+    sprite tensor followed by a reshape
+    """
+    def render_batch(self, grids):
+        if self._sprite_tensor is None:
+            self._sprite_tensor = self._build_sprite_tensor()
+        grids = np.asarray(grids)
+        num_grids, height, width = grids.shape
+        tile_size = self._sprite_tensor.shape[1]
+
+        # (N, H, W, ts, ts, 3) -> (N, H, ts, W, ts, 3)
+        frames = self._sprite_tensor[grids].transpose(0, 1, 3, 2, 4, 5)
+        return frames.reshape(num_grids, height * tile_size, width * tile_size, 3)
+
+
+    """
+    Sprites of every tile type, scaled to the tile size, blended over a
+    white background and with the grid lines already drawn on their borders.
+    Tiles without a sprite are filled with their TILE_COLORS color
+    Returns an array of shape (num_tiles, tile_size, tile_size, 3)
+    """
+    def _build_sprite_tensor(self):
+        # Only rendering needs pillow, like pygame it is imported on first use
+        from PIL import Image
+        tile_h = max(self._render_ws_height // self.height, 1)
+        tile_w = max(self._render_ws_width // self.width, 1)
+        tile_size = min(tile_h, tile_w)
+
+        sprites = np.empty((len(TILE_COLORS), tile_size, tile_size, 3), dtype=np.uint8)
+        for tile, color in enumerate(TILE_COLORS):
+            sprite_name = SPRITE_FILES.get(tile)
+            if sprite_name is None:
+                sprites[tile] = color
+                continue
+            img = Image.open(os.path.join(BASE_DIR, SPRITES_PATH, sprite_name)).convert("RGBA")
+            img = np.asarray(img.resize((tile_size, tile_size), Image.NEAREST), dtype=np.float32)
+            alpha = img[..., 3:] / 255.0
+            sprites[tile] = (img[..., :3] * alpha + 255.0 * (1.0 - alpha)).round().astype(np.uint8)
+
+        # Grid lines
+        sprites[:, :GRID_LINE_WIDTH, :] = 0
+        sprites[:, -GRID_LINE_WIDTH:, :] = 0
+        sprites[:, :, :GRID_LINE_WIDTH] = 0
+        sprites[:, :, -GRID_LINE_WIDTH:] = 0
+        return sprites
+
+
+    def close(self):
+        if self._window is not None:
+            import pygame
+            pygame.display.quit()
+            pygame.quit()
+            self._window = None
+            self._clock = None
+            self._canvas = None
+            self._rendered_grid = None
 
 
     
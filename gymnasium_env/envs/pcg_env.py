@@ -3,8 +3,12 @@ from .game import GAMES
 from .representation import REPRESENTATION
 from gymnasium_env.envs.utils.dtypes import GenerationType, TileType
 from gymnasium_env.envs.utils.rewards import *
-from gymnasium_env.envs.representation import WideRepresentation
-import config
+from gymnasium_env.envs.representation import WideRepresentation, TurtleRepresentation
+from gymnasium_env.envs.utils.path_tracker import PathTracker
+from gymnasium_env.envs.utils.stats_cache import get_stats_cache
+from gymnasium_env.envs.utils.helper import read_only_view
+from gymnasium_env.envs.utils.observation import get_flat_observation_space, encode_observation
+from gymnasium_env.envs.utils.debug import get_logger, get_debug_logger, is_debug_enabled
 
 # Third party modules
 import numpy as np
@@ -12,29 +16,65 @@ import gymnasium as gym
 from gymnasium import spaces
 from typing import Dict
 
+logger = get_logger(__name__)
+
 class PcgrlEnv(gym.Env):
     # Supported render modes
     metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 4}
 
-    # Enviromnent constructor
-    def __init__(self, 
-                 game: str,
-                 representation: str,
-                 reward_strategy: RewardStrategy,
-                 action_tiles: list[TileType],
-                 env_config: Dict,
+    """
+    Enviromnent constructor, every parameter is a keyword so that presets
+    (see gymnasium_env.PRESETS) only need to hold plain values:
+        * reward_strategy: a RewardStrategy or the name of one in
+          REWARD_STRATEGIES, built with reward_kwargs
+        * action_tiles: TileType values or names
+        * env_config: "game.config", "representation.config", change_rate,
+          observation layout... missing keys take their default value
+    """
+    def __init__(self,
+                 *,
+                 game: str = "maze",
+                 representation: str = "narrow",
+                 reward_strategy = "maze_reward_scenario3",
+                 reward_kwargs: Dict = None,
+                 action_tiles: list[TileType] = (TileType.EMPTY, TileType.WALL),
+                 env_config: Dict = None,
                  render_mode = None):
-        config.debug_print("[INIT]")
-        self._env_config = env_config
+        self._env_config = env_config if env_config is not None else {}
+        # Debug output of this env only: True or False, None follows the
+        # package logger level (see gymnasium_env.envs.utils.debug.set_debug)
+        self._debug_config = self._env_config.get("debug")
+        self._logger = get_debug_logger() if self._debug_config else logger
+        # Checked once per episode so disabled debug output costs nothing in step
+        self._debug = self._is_debug_enabled()
+        if self._debug:
+            self._logger.debug("[INIT]")
         game_config = self._env_config.get("game.config", {})
         self._init_game(game, game_config)
 
         representation_config = self._env_config.get("representation.config", {})
         self._init_representation(representation, representation_config)
 
-        self._reward = reward_strategy
-        self._action_tiles = action_tiles
+        # Each env builds its own strategy from a name
+        self._reward = get_reward_strategy(reward_strategy, **(reward_kwargs or {}))
+        # Memo of the stats of already seen grids, shared by the envs of the process:
+        # True, the max number of grids or a dict with max_size and policy
+        stats_cache = self._env_config.get("stats_cache")
+        if stats_cache:
+            if isinstance(stats_cache, dict):
+                cache_config = stats_cache
+            elif stats_cache is True:
+                cache_config = {}
+            else:
+                cache_config = {"max_size": int(stats_cache)}
+            self._reward.set_stats_cache(get_stats_cache(**cache_config))
+        self._action_tiles = [TileType[tile] if isinstance(tile, str) else TileType(tile)
+                              for tile in action_tiles]
         self._stats = None
+        # Shortest path kept up to date incrementally between steps, opt-in:
+        # the bitboard BFS of is_maze_solvable is faster on the benchmarked maps
+        use_tracker = self._env_config.get("path_tracker", False)
+        self._path_tracker = PathTracker() if use_tracker and self._reward.uses_path_stats() else None
         self._iteration = 0
         self._changes = 0
         self._change_rate = self._env_config.get("change_rate", 0.2)
@@ -42,8 +82,10 @@ class PcgrlEnv(gym.Env):
         
         self._max_iterations = self._max_changes * self._prob._width * self._prob._height
         self.render_mode = render_mode
-        config.debug_print(f'Possible actions {len(self._action_tiles)}')
-        config.debug_print(f'Actions {self._action_tiles}')
+        if self._debug:
+            self._logger.debug("Representation %s %s", representation, representation_config)
+            self._logger.debug("Possible actions %s", len(self._action_tiles))
+            self._logger.debug("Actions %s", self._action_tiles)
         self.action_space = self._representation.get_action_space(
             self._prob.height,
             self._prob.width,
@@ -55,10 +97,49 @@ class PcgrlEnv(gym.Env):
             self._prob.get_num_tiles()
         )
 
-        self._heatmap = np.zeros((self._prob._height, self._prob._width))
+        # uint8 change counts, saturated on large maps with more than 255 changes
+        self._heatmap_high = min(self._max_changes, np.iinfo(np.uint8).max)
+        self._heatmap = np.zeros((self._prob._height, self._prob._width), dtype=np.uint8)
+        self._copy_obs = self._env_config.get("copy_observations", True)
+        self._heatmap_view = read_only_view(self._heatmap)
+
+        # With an egocentric observation the heatmap is cropped as the grid,
+        # it lives inside a zero padded array
+        self._crop_size = self._representation.get_crop_size()
+        obs_shape = (self._prob._height, self._prob._width)
+        if self._crop_size is not None:
+            radius = self._crop_size // 2
+            self._padded_heatmap = np.zeros((self._prob._height + 2 * radius,
+                                             self._prob._width + 2 * radius), dtype=np.uint8)
+            self._heatmap = self._padded_heatmap[radius:radius + self._prob._height,
+                                                 radius:radius + self._prob._width]
+            obs_shape = (self._crop_size, self._crop_size)
+
         self.observation_space.spaces['heatmap'] = \
-            spaces.Box(low=0, high=self._max_changes, dtype=np.uint8, 
-                       shape=(self._prob._height, self._prob._width))
+            spaces.Box(low=0, high=self._heatmap_high, dtype=np.uint8,
+                       shape=obs_shape)
+
+        # Optional compact (C, H, W) observation
+        self._obs_layout = self._env_config.get("observation", "dict")
+        if self._obs_layout != "dict":
+            # The agent is always at the center of a cropped window,
+            # so there is no position channel in that case
+            self.observation_space = get_flat_observation_space(
+                self._obs_layout,
+                obs_shape[0],
+                obs_shape[1],
+                self._prob.get_num_tiles(),
+                "pos" in self.observation_space.spaces and self._crop_size is None,
+                self._max_changes
+            )
+            self._flat_obs = np.zeros((1, *self.observation_space.shape), dtype=np.uint8)
+            self._flat_obs_view = read_only_view(self._flat_obs[0])
+
+
+    def _is_debug_enabled(self) -> bool:
+        if self._debug_config is None:
+            return is_debug_enabled()
+        return bool(self._debug_config)
 
 
     def _init_game(self, game, game_config):
@@ -78,10 +159,18 @@ class PcgrlEnv(gym.Env):
 
     def _init_representation(self, representation, representation_config):
         generation = representation_config.get("generation", GenerationType.RANDOM)
+        if isinstance(generation, str):
+            generation = GenerationType[generation]
         random_start = representation_config.get("random_start", True)
         representation_kwargs = {
-            "random_start": random_start
+            "random_start": random_start,
+            # Compact layouts are encoded from the internal grid, no need to copy it
+            "copy_observations": self._env_config.get("copy_observations", True) and
+                                 self._env_config.get("observation", "dict") == "dict"
         }
+        for key in ("crop_size", "pad_tile", "full_tile", "tile_probs", "level_pool"):
+            if key in representation_config:
+                representation_kwargs[key] = representation_config[key]
         self._representation = REPRESENTATION[representation](generation, 
                                                               **representation_kwargs)
 
@@ -89,30 +178,42 @@ class PcgrlEnv(gym.Env):
     # Resets current enviroment
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed) 
+        if seed is not None:
+            self._representation.seed(seed)
 
         self._changes = 0
         self._iteration = 0
 
     
         self._representation.reset(self._prob.height, self._prob.width)
-        self._stats = self._reward.compute_stats(self._representation._grid)
+        path = None
+        if self._path_tracker is not None:
+            # The BFS only runs when the stats are neither in the pool nor cached
+            self._path_tracker.reset(self._representation._grid, lazy=True)
+            path = self._path_tracker.sync
+        self._stats = self._representation.get_pool_stats(self._reward.stats_dict)
+        if self._stats is None:
+            self._stats = self._reward.compute_stats(self._representation._grid, path)
         self._prob.reset(self._stats)
-        self._heatmap = np.zeros((self._prob._height, self._prob._width), dtype=np.uint8)
+        self._heatmap.fill(0)
 
-        observation = self._representation.get_observation()
-        observation["heatmap"] = self._heatmap.copy()
+        observation = self._get_observation()
 
-        config.debug_print(f'[RESET]')
-        if config.DEBUG_MODE:
+        self._debug = self._is_debug_enabled()
+        if self._debug:
+            self._logger.debug("[RESET]")
             for key, value in self._stats.items():
-                config.debug_print(f'Stat {key}: {value}')
+                self._logger.debug("Stat %s: %s", key, value)
+            if self._reward.get_stats_cache() is not None:
+                self._logger.debug("Stats cache %s", self._reward.get_stats_cache().get_info())
         return observation, self._stats
 
     
     # Change the current state
     def step(self, action):
-        config.debug_print(f'[STEP]')
-        config.debug_print(f'Action {action}')
+        if self._debug:
+            self._logger.debug("[STEP]")
+            self._logger.debug("Action %s", action)
         self._iteration += 1
         # Save copy of older grid stats
         old_stats = self._stats
@@ -121,27 +222,43 @@ class PcgrlEnv(gym.Env):
             x, y, tile_idx = action
             tile = self._action_tiles[tile_idx]
             action_to_enum = [x, y, tile]
+        elif isinstance(self._representation, TurtleRepresentation):
+            # Moves come first, then the tile placements
+            num_moves = TurtleRepresentation.NUM_MOVES
+            if action < num_moves:
+                action_to_enum = (action, None)
+            else:
+                action_to_enum = (None, self._action_tiles[action - num_moves])
         else:
             action_to_enum = self._action_tiles[action]
 
         change, x, y, action = self._representation.update(action_to_enum, len(self._action_tiles))
-        config.debug_print(f'Action {action}')
+        if self._debug:
+            self._logger.debug("Action %s", action)
         if change > 0:
             self._changes += change
-            self._heatmap[y][x] += 1
-            self._stats = self._reward.compute_stats(self._representation._grid)
+            if self._heatmap[y][x] < self._heatmap_high:
+                self._heatmap[y][x] += 1
+            path = None
+            if self._path_tracker is not None:
+                # Synced on a stats cache miss only
+                self._path_tracker.defer(*self._representation._last_change)
+                path = self._path_tracker.sync
+            self._stats = self._reward.compute_stats(self._representation._grid, path)
         
-        if config.DEBUG_MODE:
+        if self._debug:
             for key, value in self._stats.items():
-                config.debug_print(f'Stat {key}: {value}')
-                config.debug_print(f'Old stat {key}: {old_stats[key]}')
+                self._logger.debug("Stat %s: %s", key, value)
+                self._logger.debug("Old stat %s: %s", key, old_stats[key])
+            if self._reward.get_stats_cache() is not None:
+                self._logger.debug("Stats cache %s", self._reward.get_stats_cache().get_info())
 
-        # Current grid state
-        observation = self._representation.get_observation()
-        observation["heatmap"] = self._heatmap.copy()
         # Episode reward based on the change (old and new grid stats)
         reward = self._reward.get_rewards(self._stats, old_stats)
-        config.debug_print(f'Final reward {reward}')
+        if self._debug:
+            for key, (value, weighted) in self._reward.get_reward_terms(self._stats, old_stats).items():
+                self._logger.debug("Reward %s for key %s, weighted: %s", value, key, weighted)
+            self._logger.debug("Final reward %s", reward)
 
         #print(f'stats {self._stats}')
         #print(f'reward {reward}')
@@ -151,8 +268,11 @@ class PcgrlEnv(gym.Env):
         # Episoded ended because iterative limitations reached
         truncated = self._changes >= self._max_changes or self._iteration >= self._max_iterations
 
-        # Episode debugging info
-        info = self._reward.compute_stats(self._representation._grid)
+        # Current grid state, the last one of an episode outlives the next reset
+        observation = self._get_observation(copy=done or truncated)
+
+        # Episode debugging info (stats are already up to date with the grid)
+        info = dict(self._stats)
         info["iterations"] = self._iteration
         info["changes"] = self._changes
         info["max_iterations"] = self._max_iterations
@@ -161,9 +281,46 @@ class PcgrlEnv(gym.Env):
         return observation, reward, done, truncated, info
 
     
+    """
+    With copy_observations disabled in the env config the observation
+    arrays are read-only views of the env state, valid until the next
+    step or reset, callers keeping observations around must copy them.
+    The observation ending an episode is always a copy: vectorized envs
+    such as SB3's DummyVecEnv keep it as terminal_observation and reset
+    right away, which would overwrite a view
+    """
+    def _get_observation(self, copy: bool = False):
+        observation = self._representation.get_observation()
+        if self._crop_size is not None:
+            heatmap = self._representation.crop(self._padded_heatmap)
+        else:
+            heatmap = self._heatmap
+
+        if self._obs_layout != "dict":
+            pos = observation.get("pos")
+            encode_observation(self._obs_layout,
+                               observation["grid"][None],
+                               None if pos is None or self._crop_size is not None else pos[None],
+                               heatmap[None],
+                               self._prob.get_num_tiles(),
+                               self._flat_obs)
+            return self._flat_obs[0].copy() if self._copy_obs or copy else self._flat_obs_view
+
+        if not self._copy_obs and copy:
+            observation = {key: value.copy() for key, value in observation.items()}
+            observation["heatmap"] = heatmap.copy()
+        elif self._copy_obs:
+            observation["heatmap"] = heatmap.copy()
+        elif self._crop_size is not None:
+            observation["heatmap"] = read_only_view(heatmap)
+        else:
+            observation["heatmap"] = self._heatmap_view
+        return observation
+
+
     def render(self):
-        self._prob.render(self._representation._grid)
+        return self._prob.render(self._representation._grid)
   
 
     def close(self):
-        self._prob.render(self._representation._grid)
+        self._prob.close()
@@ -0,0 +1,305 @@
+# Custom defined modules
+from gymnasium_env.envs.pcg_env import PcgrlEnv
+from gymnasium_env.envs.utils.dtypes import GRID_DTYPE, TileType
+from gymnasium_env.envs.utils.helper import read_only_view
+from gymnasium_env.envs.utils.observation import encode_observation
+from gymnasium_env.envs.representation import NarrowRepresentation, WideRepresentation, TurtleRepresentation
+
+# Third party modules
+import numpy as np
+import gymnasium as gym
+from gymnasium.vector import AutoresetMode
+from gymnasium.vector.utils import batch_space
+from typing import Dict
+
+
+"""
+Vectorized version of PcgrlEnv
+
+All the grids, heatmaps and cursor positions live in (N, ...) arrays, so a
+step applies the N actions with fancy indexing and computes the stats of
+every changed grid with a single RewardStrategy.compute_stats_batch call.
+Rewards and episode ends are evaluated for all the sub-environments at once.
+Sub-environments that finish are reset on the same step, the last
+observation and info being returned in infos["final_obs"] and
+infos["final_info"]. The final info also holds the finished grid.
+"""
+class PcgrlVectorEnv(gym.vector.VectorEnv):
+    metadata = {
+        "render_modes": ["human", "rgb_array"],
+        "render_fps": 4,
+        "autoreset_mode": AutoresetMode.SAME_STEP,
+    }
+
+    # Same keyword parameters as PcgrlEnv
+    def __init__(self,
+                 num_envs: int,
+                 render_mode = None,
+                 **kwargs):
+        # Single environment used as template for the game, representation,
+        # reward strategy, spaces and episode limits
+        self._env = PcgrlEnv(render_mode=render_mode, **kwargs)
+        self._representation = self._env._representation
+        self._reward = self._env._reward
+        if not isinstance(self._representation, (NarrowRepresentation, WideRepresentation)):
+            raise ValueError(f"Representation not supported by PcgrlVectorEnv: "
+                             f"{type(self._representation).__name__}")
+
+        self.num_envs = num_envs
+        self.render_mode = render_mode
+        self.single_action_space = self._env.action_space
+        self.single_observation_space = self._env.observation_space
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+        self._height = self._env._prob.height
+        self._width = self._env._prob.width
+        self._max_changes = self._env._max_changes
+        self._max_iterations = self._env._max_iterations
+        self._action_tiles = np.array(self._env._action_tiles, dtype=GRID_DTYPE)
+        # Turtle is a narrow representation with its own actions
+        self._narrow = isinstance(self._representation, NarrowRepresentation)
+        self._turtle = isinstance(self._representation, TurtleRepresentation)
+
+        shape = (num_envs, self._height, self._width)
+        self._grids = np.zeros(shape, dtype=GRID_DTYPE)
+        self._heatmaps = np.zeros(shape, dtype=np.uint8)
+        self._x = np.zeros(num_envs, dtype=np.intp)
+        self._y = np.zeros(num_envs, dtype=np.intp)
+        self._iterations = np.zeros(num_envs, dtype=np.int64)
+        self._changes = np.zeros(num_envs, dtype=np.int64)
+        self._stats = None
+        self._env_ids = np.arange(num_envs)
+
+        # Egocentric observations: grids and heatmaps live inside padded
+        # arrays and the windows are gathered from sliding window views
+        self._crop_size = self._representation.get_crop_size()
+        obs_grids, obs_heatmaps = self._grids, self._heatmaps
+        if self._crop_size is not None:
+            radius = self._crop_size // 2
+            padded_shape = (num_envs, self._height + 2 * radius, self._width + 2 * radius)
+            self._padded_grids = np.full(padded_shape, self._representation._pad_tile, dtype=GRID_DTYPE)
+            self._padded_heatmaps = np.zeros(padded_shape, dtype=np.uint8)
+            interior = (slice(None), slice(radius, radius + self._height), slice(radius, radius + self._width))
+            self._grids = self._padded_grids[interior]
+            self._heatmaps = self._padded_heatmaps[interior]
+
+            window = (self._crop_size, self._crop_size)
+            self._grid_windows = np.lib.stride_tricks.sliding_window_view(
+                self._padded_grids, window, axis=(1, 2))
+            self._heatmap_windows = np.lib.stride_tricks.sliding_window_view(
+                self._padded_heatmaps, window, axis=(1, 2))
+            obs_grids = np.zeros((num_envs, *window), dtype=GRID_DTYPE)
+            obs_heatmaps = np.zeros((num_envs, *window), dtype=np.uint8)
+        self._obs_grids, self._obs_heatmaps = obs_grids, obs_heatmaps
+
+        self._copy_obs = self._env._copy_obs
+        self._pos = np.zeros((num_envs, 2), dtype=np.uint8)
+        self._obs = {"grid": read_only_view(obs_grids)}
+        if self._narrow:
+            self._obs["pos"] = read_only_view(self._pos)
+        self._obs["heatmap"] = read_only_view(obs_heatmaps)
+
+        self._obs_layout = self._env._obs_layout
+        if self._obs_layout != "dict":
+            self._flat_obs = np.zeros(self.observation_space.shape, dtype=np.uint8)
+            self._flat_obs_view = read_only_view(self._flat_obs)
+
+
+    def _reset_envs(self, env_ids):
+        # Grids are generated in one batch by the template representation,
+        # so every GenerationType behaves as in PcgrlEnv
+        self._grids[env_ids] = self._representation.generate(self._height, self._width,
+                                                             len(env_ids))
+        if self._narrow:
+            if self._representation._random_start:
+                self._x[env_ids] = self._representation._random.integers(0, self._width, size=len(env_ids))
+                self._y[env_ids] = self._representation._random.integers(0, self._height, size=len(env_ids))
+            else:
+                self._x[env_ids] = 0
+                self._y[env_ids] = 0
+
+        self._heatmaps[env_ids] = 0
+        self._iterations[env_ids] = 0
+        self._changes[env_ids] = 0
+
+        stats = self._representation.get_pool_stats(self._reward.stats_dict)
+        if stats is None:
+            stats = self._reward.compute_stats_batch(self._grids[env_ids])
+        if self._stats is None:
+            self._stats = {key: np.zeros(self.num_envs, dtype=value.dtype)
+                           for key, value in stats.items()}
+        for key, value in stats.items():
+            self._stats[key][env_ids] = value
+
+
+    """
+    Resets all the sub-environments, or only the ones selected by a
+    boolean array of shape (num_envs,) in options["reset_mask"]
+    (as the gymnasium vector envs)
+    """
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        if seed is not None:
+            self._representation.seed(seed)
+
+        reset_mask = None if options is None else options.get("reset_mask")
+        if reset_mask is None:
+            self._reset_envs(self._env_ids)
+        else:
+            reset_mask = np.asarray(reset_mask, dtype=np.bool_)
+            if reset_mask.shape != (self.num_envs,):
+                raise ValueError(f"reset_mask must have shape ({self.num_envs},)")
+            self._reset_envs(self._env_ids[reset_mask])
+        return self._get_observation(), self._get_stats_info()
+
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        self._iterations += 1
+        old_stats = {key: value.copy() for key, value in self._stats.items()}
+
+        if self._turtle:
+            num_moves = TurtleRepresentation.NUM_MOVES
+            placing = actions >= num_moves
+            x, y = self._x.copy(), self._y.copy()
+            tiles = self._action_tiles[np.where(placing, actions - num_moves, 0)]
+        elif self._narrow:
+            x, y, tiles = self._x.copy(), self._y.copy(), self._action_tiles[actions]
+        else:
+            x, y, tiles = actions[:, 0], actions[:, 1], self._action_tiles[actions[:, 2]]
+
+        # Apply all the edits at once
+        current = self._grids[self._env_ids, y, x]
+        changed = current != tiles
+        if self._turtle:
+            changed &= placing
+        if self._narrow and len(self._action_tiles) == 2:
+            changed &= (current != TileType.START) & (current != TileType.END)
+        self._grids[self._env_ids[changed], y[changed], x[changed]] = tiles[changed]
+
+        if self._turtle:
+            # Cursors of the move actions, they stop at the borders
+            moves = np.array(TurtleRepresentation.MOVES)[np.where(placing, 0, actions)]
+            self._x = np.where(placing, x, np.clip(x + moves[:, 0], 0, self._width - 1))
+            self._y = np.where(placing, y, np.clip(y + moves[:, 1], 0, self._height - 1))
+        elif self._narrow:
+            self._move_cursors()
+            x, y = self._x, self._y
+
+        # Same as PcgrlEnv, the heatmap is updated on the position returned
+        # by the representation update
+        self._changes += changed
+        cells = (self._env_ids[changed], y[changed], x[changed])
+        self._heatmaps[cells] = np.minimum(self._heatmaps[cells], self._env._heatmap_high - 1) + 1
+        if changed.any():
+            new_stats = self._reward.compute_stats_batch(self._grids[changed])
+            for key, value in new_stats.items():
+                self._stats[key][changed] = value
+
+        rewards = self._reward.get_rewards_batch(self._stats, old_stats)
+        terminations = self._reward.get_episode_over_batch(self._stats, old_stats)
+        truncations = (self._changes >= self._max_changes) | \
+                      (self._iterations >= self._max_iterations)
+
+        infos = self._get_stats_info()
+        infos.update({
+            "iterations": self._iterations.copy(),
+            "changes": self._changes.copy(),
+            "max_iterations": np.full(self.num_envs, self._max_iterations),
+            "max_changes": np.full(self.num_envs, self._max_changes),
+        })
+
+        observation = self._get_observation()
+        ended = np.flatnonzero(terminations | truncations)
+        if len(ended) > 0:
+            final_obs = np.full(self.num_envs, None, dtype=object)
+            final_info = np.full(self.num_envs, None, dtype=object)
+            for i in ended:
+                if self._obs_layout != "dict":
+                    final_obs[i] = observation[i].copy()
+                else:
+                    final_obs[i] = {key: value[i].copy() for key, value in observation.items()}
+                final_info[i] = {key: value[i] for key, value in infos.items()
+                                 if not key.startswith("_")}
+                # The grid is reset below, keep the generated level
+                final_info[i]["grid"] = self._grids[i].copy()
+            mask = np.zeros(self.num_envs, dtype=np.bool_)
+            mask[ended] = True
+
+            self._reset_envs(ended)
+            observation = self._get_observation()
+            for key, value in self._get_stats_info().items():
+                infos[key] = value
+            for key in ("iterations", "changes", "max_iterations", "max_changes"):
+                infos[f"_{key}"] = ~mask
+            infos.update({
+                "final_obs": final_obs, "_final_obs": mask,
+                "final_info": final_info, "_final_info": mask.copy(),
+            })
+
+        return observation, rewards, terminations, truncations, infos
+
+
+    def _move_cursors(self):
+        if self._representation._random_start:
+            self._x = self.np_random.integers(0, self._width, size=self.num_envs)
+            self._y = self.np_random.integers(0, self._height, size=self.num_envs)
+            if len(self._action_tiles) == 2:
+                # Cursors can only land on tiles the agent is able to edit
+                invalid = self._grids[self._env_ids, self._y, self._x] > TileType.WALL
+                while invalid.any():
+                    ids = self._env_ids[invalid]
+                    self._x[ids] = self.np_random.integers(0, self._width, size=len(ids))
+                    self._y[ids] = self.np_random.integers(0, self._height, size=len(ids))
+                    invalid[ids] = self._grids[ids, self._y[ids], self._x[ids]] > TileType.WALL
+        else:
+            self._x += 1
+            wrapped = self._x >= self._width
+            self._x[wrapped] = 0
+            self._y[wrapped] += 1
+            self._y[self._y >= self._height] = 0
+
+
+    def _get_observation(self) -> Dict[str, np.ndarray]:
+        if self._narrow:
+            self._pos[:, 0] = self._x
+            self._pos[:, 1] = self._y
+        if self._crop_size is not None:
+            self._obs_grids[...] = self._grid_windows[self._env_ids, self._y, self._x]
+            self._obs_heatmaps[...] = self._heatmap_windows[self._env_ids, self._y, self._x]
+
+        if self._obs_layout != "dict":
+            encode_observation(self._obs_layout,
+                               self._obs_grids,
+                               self._pos if self._narrow and self._crop_size is None else None,
+                               self._obs_heatmaps,
+                               self._env._prob.get_num_tiles(),
+                               self._flat_obs)
+            return self._flat_obs.copy() if self._copy_obs else self._flat_obs_view
+        if not self._copy_obs:
+            return self._obs
+        return {key: value.copy() for key, value in self._obs.items()}
+
+
+    def _get_stats_info(self) -> dict:
+        infos = {}
+        for key, value in self._stats.items():
+            infos[key] = value.copy()
+            infos[f"_{key}"] = np.ones(self.num_envs, dtype=np.bool_)
+        return infos
+
+
+    # Frames of all sub-environments for rgb_array, otherwise
+    # render the first sub-environment
+    def render(self):
+        if self._env._prob._render_mode == "rgb_array":
+            return self._env._prob.render_batch(self._grids)
+        return self._env._prob.render(self._grids[0])
+
+
+    def close_extras(self, **kwargs):
+        # __init__ may have failed before creating the template env
+        env = getattr(self, "_env", None)
+        if env is not None:
+            env.close()
@@ -1,8 +1,10 @@
 from .narrow import NarrowRepresentation
 from .wide import WideRepresentation
+from .turtle import TurtleRepresentation
 
 # all the problems should be defined here with its corresponding class
 REPRESENTATION = {
     "narrow": NarrowRepresentation,
-    "wide": WideRepresentation
+    "wide": WideRepresentation,
+    "turtle": TurtleRepresentation
 }
\ No newline at end of file
@@ -7,8 +7,7 @@ import numpy as np
 from collections import OrderedDict
 from typing import Dict, Tuple
 from numpy.typing import NDArray
-import config
-
+from gymnasium_env.envs.utils.helper import read_only_view
 
 
 class NarrowRepresentation(Representation):
@@ -16,19 +15,32 @@ class NarrowRepresentation(Representation):
                  gen_type: GenerationType, 
                  **kwargs):
         self._random_start = kwargs.pop("random_start", True)
-        print(f' representation{self._random_start}')
+        # Egocentric observation: a crop_size x crop_size window centered on
+        # the agent, cells outside the grid are observed as pad_tile
+        self._crop_size = kwargs.pop("crop_size", None)
+        if self._crop_size is not None and \
+                (int(self._crop_size) != self._crop_size or self._crop_size <= 0 or self._crop_size % 2 == 0):
+            # An even window has no center cell for the agent
+            raise ValueError(f"crop_size must be a positive odd integer, got {self._crop_size}")
+        self._pad_tile = kwargs.pop("pad_tile", TileType.WALL)
+        self._padded_grid = None
         super().__init__(gen_type, **kwargs)
         self._x = None
         self._y = None
+        # Preallocated observation used when observations are not copied
+        self._pos = np.zeros(2, dtype=np.uint8)
+        self._obs = OrderedDict({"pos": read_only_view(self._pos), "grid": None})
 
     
 
     def reset(self, width: GRID_SIZE_DTYPE, height: GRID_SIZE_DTYPE):
         super().reset(width, height)
+        if self._crop_size is not None:
+            self._pad_grid()
         
         if self._random_start:
-            self._x = self._random.integers(0, width)
-            self._y = self._random.integers(0, height)
+            self._x = self._random.integers(0, self._grid.shape[1])
+            self._y = self._random.integers(0, self._grid.shape[0])
         else:
             self._x = 0
             self._y = 0
@@ -37,6 +49,29 @@ class NarrowRepresentation(Representation):
     def _set_random_pos(self, num_tiles):
         ...
 
+
+    """
+    Move the grid inside a padded one and keep _grid as a view of its
+    interior, so that updates are seen by the padded grid and the
+    observation window is just a slice of it
+    """
+    def _pad_grid(self):
+        radius = self._crop_size // 2
+        rows, cols = self._grid.shape
+        self._padded_grid = np.full((rows + 2 * radius, cols + 2 * radius),
+                                    self._pad_tile, dtype=GRID_DTYPE)
+        self._padded_grid[radius:radius + rows, radius:radius + cols] = self._grid
+        self._grid = self._padded_grid[radius:radius + rows, radius:radius + cols]
+
+
+    def get_crop_size(self):
+        return self._crop_size
+
+
+    # Window centered on the agent of an array padded by crop_size // 2 on each side
+    def crop(self, padded: NDArray) -> NDArray:
+        return padded[self._y:self._y + self._crop_size, self._x:self._x + self._crop_size]
+
     def get_action_space(self, 
                          height: GRID_SIZE_DTYPE, 
                          width: GRID_SIZE_DTYPE, 
@@ -49,6 +84,12 @@ class NarrowRepresentation(Representation):
                               width: GRID_SIZE_DTYPE, 
                               num_tiles: int
                               ) -> Dict[str, spaces.Box]:
+        if self._crop_size is not None:
+            return spaces.Dict({
+                "pos": spaces.Box(low=np.array([0, 0]), high=np.array([width-1, height-1]), dtype=GRID_DTYPE),
+                "grid": spaces.Box(low=0, high=max(num_tiles-1, self._pad_tile), dtype=np.uint8,
+                                   shape=(self._crop_size, self._crop_size))
+            })
         return spaces.Dict({
             "pos": spaces.Box(low=np.array([0, 0]), high=np.array([width-1, height-1]), dtype=GRID_DTYPE),
             "grid": spaces.Box(low=0, high=num_tiles-1, dtype=np.uint8, shape=(height, width))
@@ -56,6 +97,22 @@ class NarrowRepresentation(Representation):
 
     
     def get_observation(self) -> OrderedDict[str, NDArray]:
+        if self._crop_size is not None:
+            window = self.crop(self._padded_grid)
+            if not self._copy_obs:
+                self._pos[0] = self._x
+                self._pos[1] = self._y
+                self._obs["grid"] = read_only_view(window)
+                return self._obs
+            return OrderedDict({
+                "pos": np.array([self._x, self._y], dtype=np.uint8),
+                "grid": window.copy()
+            })
+        if not self._copy_obs:
+            self._pos[0] = self._x
+            self._pos[1] = self._y
+            self._obs["grid"] = self._get_grid_observation()
+            return self._obs
         return OrderedDict({
             "pos": np.array([self._x, self._y], dtype=np.uint8),
             "grid": self._grid.copy()
@@ -71,6 +128,7 @@ class NarrowRepresentation(Representation):
         else:
             change = int(current_tile != action)
             self._grid[self._y][self._x] = action
+            self._last_change = (self._x, self._y, current_tile, action)
         
         if self._random_start:
             while True:
@@ -1,6 +1,9 @@
 from gymnasium_env.envs.utils.dtypes import GenerationType, GRID_SIZE_DTYPE
 from gymnasium_env.envs.utils.generation import *
 
+from gymnasium_env.envs.utils.helper import read_only_view
+from gymnasium_env.envs.utils.level_pool import LevelPool
+
 from gymnasium.utils import seeding
 
 
@@ -12,8 +15,21 @@ class Representation():
                  gen_type: GenerationType = GenerationType.RANDOM,
                  **kwargs):
         self._grid: GRID_ARR_DTYPE = None
+        # When False observations are read-only views of the internal
+        # state instead of copies, they change with the next update
+        self._copy_obs = kwargs.pop("copy_observations", True)
+        self._grid_view = None
+        # Initial levels are sampled from a pre-generated pool instead of
+        # being generated when a pool (or the path of one) is given
+        self._level_pool = kwargs.pop("level_pool", None)
+        if isinstance(self._level_pool, str):
+            self._level_pool = LevelPool(self._level_pool)
+        # Pool indices of the last generated grids
+        self._pool_indices = None
         self._gen_type = gen_type
         self._gen_kwargs = kwargs
+        # Last edited tile as (x, y, old_tile, new_tile)
+        self._last_change = None
         self.seed()
 
 
@@ -22,30 +38,61 @@ class Representation():
         return seed
     
     def reset(self, height: GRID_SIZE_DTYPE, width: GRID_SIZE_DTYPE) -> None:
-        if self._gen_type == GenerationType.EMPTY:
-            self._grid = generation_empty(height, width)
-        elif self._gen_type == GenerationType.FULL:
-            tile = self._gen_kwargs.get("full_tile", TileType.WALL)
-            self._grid = generation_full_tile(height, width, tile)
-        elif self._gen_type == GenerationType.RANDOM:
-            self._grid = random_gen(
-                height, width,
-                tile_probs = {
-                    TileType.EMPTY: 0.7,
-                    TileType.WALL: 0.2,
-                    TileType.START: 0.05,
-                    TileType.END: 0.05,
-                },
-                rng=self._random
-            )
-        elif self._gen_type == GenerationType.CUSTOM1:
-            self._grid = maze_custom_gen1(height, width)
-        elif self._gen_type == GenerationType.CUSTOM2:
-            self._grid = maze_custom_gen2(height, width)
-        else:
-            raise ValueError(f"Unknown generation type: {self._gen_type}")
-    
-    
+        self._grid = self.generate(height, width)
+
+
+    """
+    Generate one initial grid (num_grids=None) or a batch of them with the
+    representation GenerationType and the representation random generator,
+    or sample them from the level pool
+    """
+    def generate(self,
+                 height: GRID_SIZE_DTYPE,
+                 width: GRID_SIZE_DTYPE,
+                 num_grids = None) -> GRID_ARR_DTYPE:
+        if self._level_pool is not None:
+            if self._level_pool.shape != (height, width):
+                raise ValueError(f"Level pool shape {self._level_pool.shape} does not "
+                                 f"match the grid shape {(height, width)}")
+            self._pool_indices = self._level_pool.sample(self._random, num_grids)
+            return self._level_pool.get_grids(self._pool_indices)
+        return generate(self._gen_type, height, width, self._random,
+                        num_grids, **self._get_generation_kwargs())
+
+
+    def _get_generation_kwargs(self) -> dict:
+        if self._gen_type == GenerationType.FULL:
+            return {"tile_type": self._gen_kwargs.get("full_tile", TileType.WALL)}
+        if self._gen_type == GenerationType.RANDOM:
+            return {"tile_probs": self._gen_kwargs.get("tile_probs", DEFAULT_TILE_PROBS)}
+        return {}
+
+
+    """
+    Precomputed stats of the last generated grids for the given keys,
+    None when they are not sampled from a pool that stores all of them
+    """
+    def get_pool_stats(self, keys):
+        if self._level_pool is None:
+            return None
+        return self._level_pool.get_stats(self._pool_indices, keys)
+
+
+    # Size of the egocentric observation window, None when the
+    # whole grid is observed
+    def get_crop_size(self):
+        return None
+
+
+    # Grid to place in the observations, a copy or a read-only view
+    def _get_grid_observation(self) -> GRID_ARR_DTYPE:
+        if self._copy_obs:
+            return self._grid.copy()
+        # The grid is replaced on every reset, the view follows it
+        if self._grid_view is None or self._grid_view.base is not self._grid:
+            self._grid_view = read_only_view(self._grid)
+        return self._grid_view
+
 
     def get_action_space(self, height, width, tile_values):
         raise NotImplementedError('get_action_space is not implemented')
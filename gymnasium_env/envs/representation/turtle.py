@@ -0,0 +1,54 @@
+from gymnasium_env.envs.utils.dtypes import GRID_SIZE_DTYPE, TileType
+from gymnasium_env.envs.utils.dtypes import GenerationType
+from .narrow import NarrowRepresentation
+from gymnasium import spaces
+from typing import Tuple
+
+
+"""
+The agent moves a cursor over the grid and places tiles where it stands.
+Actions are the NUM_MOVES moves followed by one placement per action tile,
+so the action space does not grow with the grid size. Moves and placements
+only touch the cursor cell, and the observation (position, grid or
+egocentric window) is the same as the narrow representation
+"""
+class TurtleRepresentation(NarrowRepresentation):
+    # (dx, dy) of each move action: up, down, left, right
+    MOVES = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+    NUM_MOVES = len(MOVES)
+
+    def __init__(self,
+                 gen_type: GenerationType,
+                 **kwargs):
+        super().__init__(gen_type, **kwargs)
+
+
+    def get_action_space(self,
+                         height: GRID_SIZE_DTYPE,
+                         width: GRID_SIZE_DTYPE,
+                         num_tiles: int):
+        return spaces.Discrete(self.NUM_MOVES + num_tiles)
+
+
+    """
+    action is a (move, tile) pair where only one of them is not None
+    """
+    def update(self, action, number_tiles: int) -> Tuple[bool, int, int, int]:
+        move, tile = action
+        x, y = self._x, self._y
+
+        if move is not None:
+            dx, dy = self.MOVES[move]
+            # The cursor stops at the borders of the grid
+            self._x = min(max(x + dx, 0), self._grid.shape[1] - 1)
+            self._y = min(max(y + dy, 0), self._grid.shape[0] - 1)
+            return 0, x, y, action
+
+        current_tile = self._grid[y][x]
+        if number_tiles == 2 and (current_tile == TileType.START or current_tile == TileType.END):
+            return 0, x, y, action
+
+        change = int(current_tile != tile)
+        self._grid[y][x] = tile
+        self._last_change = (x, y, current_tile, tile)
+        return change, x, y, action
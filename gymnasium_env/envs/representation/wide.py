@@ -10,6 +10,7 @@ class WideRepresentation(Representation):
                  gen_type: GenerationType,
                  **kwargs):
         super().__init__(gen_type, **kwargs)
+        self._obs = {"grid": None}
 
 
     def get_action_space(self, width, height, num_tiles):
@@ -23,6 +24,9 @@ class WideRepresentation(Representation):
 
 
     def get_observation(self):
+        if not self._copy_obs:
+            self._obs["grid"] = self._get_grid_observation()
+            return self._obs
         return {
             "grid": self._grid.copy()
         }
@@ -33,4 +37,5 @@ class WideRepresentation(Representation):
         old_tile = self._grid[y][x]
         change = int(old_tile != new_tile)
         self._grid[y][x] = new_tile
+        self._last_change = (x, y, old_tile, new_tile)
         return change, x, y, action
\ No newline at end of file
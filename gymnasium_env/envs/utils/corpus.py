@@ -0,0 +1,280 @@
+from .dtypes import GRID_SIZE_DTYPE, TileType
+from .helper import pack_grids, unpack_grids, hash_packed_grids
+from .rewards import RewardStrategy, TILE_COUNT_STATS, PATH_STATS
+from .debug import get_logger
+
+from typing import Optional, Tuple
+import numpy as np
+import json
+import os
+
+logger = get_logger(__name__)
+
+
+"""
+Deduplicated store of generated levels
+
+The corpus is a folder of fixed size shards, each one made of three
+memory-mapped .npy files:
+    * grids_XXXXX.npy: the grids packed to 2 bits per tile
+    * stats_XXXXX.npy: a record of stats (CORPUS_STATS) per grid
+    * hashes_XXXXX.npy: a 64 bits hash of each packed grid
+and a meta.json with the grid shape and the number of levels per shard.
+Levels are only added when their packed bytes are not in the corpus yet,
+which is checked with an in-memory hash index rebuilt from the hashes
+files on open, the packed bytes being compared on every hash hit.
+Queries scan the stats records shard by shard, the grids are only read
+for the selected levels
+"""
+CORPUS_STATS = np.dtype(
+    [(key, np.int32) for key in TILE_COUNT_STATS] +
+    [("is_grid_solvable", np.bool_), ("path_length", np.int32)]
+)
+
+
+class LevelCorpus():
+    def __init__(self,
+                 path: str,
+                 height: Optional[GRID_SIZE_DTYPE] = None,
+                 width: Optional[GRID_SIZE_DTYPE] = None,
+                 shard_size: int = 1 << 16,
+                 read_only: bool = False):
+        self.path = path
+        self._read_only = read_only
+        self._meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            if (height, width) != (None, None) and (height, width) != (meta["height"], meta["width"]):
+                raise ValueError(f"Corpus {path} holds {meta['height']}x{meta['width']} grids")
+        elif read_only:
+            raise FileNotFoundError(f"No corpus found at {path}")
+        elif height is None or width is None:
+            raise ValueError("height and width are needed to create a corpus")
+        else:
+            os.makedirs(path, exist_ok=True)
+            meta = {"height": int(height), "width": int(width),
+                    "shard_size": int(shard_size), "shard_counts": []}
+
+        self.height, self.width = meta["height"], meta["width"]
+        self._shard_size = meta["shard_size"]
+        self._counts = list(meta["shard_counts"])
+        self._packed_size = pack_grids(np.zeros((1, self.height, self.width))).shape[-1]
+        self._shards = [self._open_shard(i) for i in range(len(self._counts))]
+
+        self._strategy = RewardStrategy()
+        for key in CORPUS_STATS.names:
+            self._strategy.set_stats(key)
+
+        # Hash of the packed grid -> level index, and the other levels
+        # with the same hash when different grids collide
+        self._index = {}
+        self._collisions = {}
+        for shard, (_, _, hashes) in enumerate(self._shards):
+            offset = shard * self._shard_size
+            count = self._counts[shard]
+            for key, index in zip(hashes[:count].tolist(), range(offset, offset + count)):
+                self._register(key, index)
+
+
+    def _register(self, key: int, index: int):
+        if key in self._index:
+            self._collisions.setdefault(key, []).append(index)
+        else:
+            self._index[key] = index
+
+
+    # Levels whose packed grid has the hash key
+    def _candidates(self, key: int) -> list:
+        index = self._index.get(key)
+        if index is None:
+            return []
+        return [index, *self._collisions.get(key, ())]
+
+
+    def _packed_row(self, index: int) -> np.ndarray:
+        shard, offset = divmod(index, self._shard_size)
+        return self._shards[shard][0][offset]
+
+
+    def _shard_files(self, shard: int):
+        return [os.path.join(self.path, f"{name}_{shard:05d}.npy")
+                for name in ("grids", "stats", "hashes")]
+
+
+    def _open_shard(self, shard: int, create: bool = False):
+        grids_path, stats_path, hashes_path = self._shard_files(shard)
+        if create:
+            return (
+                np.lib.format.open_memmap(grids_path, mode="w+", dtype=np.uint8,
+                                          shape=(self._shard_size, self._packed_size)),
+                np.lib.format.open_memmap(stats_path, mode="w+", dtype=CORPUS_STATS,
+                                          shape=(self._shard_size,)),
+                np.lib.format.open_memmap(hashes_path, mode="w+", dtype=np.uint64,
+                                          shape=(self._shard_size,)),
+            )
+        mode = "r" if self._read_only else "r+"
+        return tuple(np.load(file, mmap_mode=mode) for file in (grids_path, stats_path, hashes_path))
+
+
+    def __len__(self) -> int:
+        return sum(self._counts)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    """
+    Add grids with shape (N, H, W) that are not in the corpus yet.
+    Stats are computed when not given (a dict of (N,) arrays with the
+    CORPUS_STATS keys).
+    Returns the corpus index of every grid and which ones were added
+    """
+    def add(self, grids, stats: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self._read_only:
+            raise ValueError("The corpus is opened as read-only")
+        grids = np.asarray(grids)
+        if grids.shape[1:] != (self.height, self.width):
+            raise ValueError(f"Grids must have shape (N, {self.height}, {self.width})")
+
+        if grids.size and grids.max() >= len(TileType):
+            raise ValueError("Only TileType values can be stored in the corpus")
+
+        packed = pack_grids(grids)
+        hashes = hash_packed_grids(packed)
+        indices = np.empty(len(grids), dtype=np.int64)
+        added = np.zeros(len(grids), dtype=np.bool_)
+        first_new = next_index = len(self)
+        # Level index -> row in packed of the levels added by this batch
+        new_rows = {}
+        for i, key in enumerate(hashes.tolist()):
+            index = None
+            for candidate in self._candidates(key):
+                row = packed[new_rows[candidate]] if candidate >= first_new else self._packed_row(candidate)
+                if np.array_equal(row, packed[i]):
+                    index = candidate
+                    break
+            if index is None:
+                # New level, also deduplicates the grids of this batch
+                index = next_index
+                next_index += 1
+                self._register(key, index)
+                new_rows[index] = i
+                added[i] = True
+            indices[i] = index
+
+        new = np.flatnonzero(added)
+        if len(new) == 0:
+            return indices, added
+        if stats is None:
+            stats = self._strategy.compute_stats_batch(grids[new])
+        else:
+            stats = {key: np.asarray(stats[key])[new] for key in CORPUS_STATS.names}
+
+        begin = 0
+        while begin < len(new):
+            if not self._counts or self._counts[-1] == self._shard_size:
+                self._shards.append(self._open_shard(len(self._counts), create=True))
+                self._counts.append(0)
+            shard_grids, shard_stats, shard_hashes = self._shards[-1]
+            start = self._counts[-1]
+            end = min(self._shard_size, start + len(new) - begin)
+            rows = new[begin:begin + end - start]
+            shard_grids[start:end] = packed[rows]
+            shard_hashes[start:end] = hashes[rows]
+            for key in CORPUS_STATS.names:
+                shard_stats[key][start:end] = stats[key][begin:begin + end - start]
+            self._counts[-1] = end
+            begin += end - start
+
+        logger.debug("Corpus %s: %d new levels, %d in total", self.path, len(new), len(self))
+        return indices, added
+
+
+    def _locate(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        if indices.size and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError("Level index out of range")
+        return indices // self._shard_size, indices % self._shard_size
+
+
+    # Unpacked grids of the levels at indices, shape (len(indices), H, W)
+    def get_grids(self, indices) -> np.ndarray:
+        shards, offsets = self._locate(indices)
+        packed = np.empty((len(shards), self._packed_size), dtype=np.uint8)
+        for shard in np.unique(shards):
+            selected = shards == shard
+            packed[selected] = self._shards[shard][0][offsets[selected]]
+        return unpack_grids(packed, self.height, self.width)
+
+
+    def get_stats(self, indices) -> np.ndarray:
+        shards, offsets = self._locate(indices)
+        stats = np.empty(len(shards), dtype=CORPUS_STATS)
+        for shard in np.unique(shards):
+            selected = shards == shard
+            stats[selected] = self._shards[shard][1][offsets[selected]]
+        return stats
+
+
+    def contains(self, grid) -> bool:
+        packed = pack_grids(np.asarray(grid)[None])
+        key = int(hash_packed_grids(packed)[0])
+        return any(np.array_equal(self._packed_row(index), packed[0]) for index in self._candidates(key))
+
+
+    """
+    Indices of the levels matching every filter, filters are stat names
+    with either a value or a (low, high) inclusive range, e.g.
+    corpus.query(is_grid_solvable=True, path_length=(8, 12))
+    """
+    def query(self, limit: Optional[int] = None, **filters) -> np.ndarray:
+        for key in filters:
+            if key not in CORPUS_STATS.names:
+                raise ValueError(f"Unknown corpus stat: {key}")
+
+        results = []
+        found = 0
+        for shard, (_, stats, _) in enumerate(self._shards):
+            count = self._counts[shard]
+            mask = np.ones(count, dtype=np.bool_)
+            for key, value in filters.items():
+                column = stats[key][:count]
+                if isinstance(value, tuple):
+                    low, high = value
+                    mask &= (column >= low) & (column <= high)
+                else:
+                    mask &= column == value
+            matches = np.flatnonzero(mask) + shard * self._shard_size
+            results.append(matches)
+            found += len(matches)
+            if limit is not None and found >= limit:
+                break
+
+        indices = np.concatenate(results) if results else np.zeros(0, dtype=np.int64)
+        return indices[:limit] if limit is not None else indices
+
+
+    # Write the shards and the level counts to disk
+    def flush(self):
+        if self._read_only:
+            return
+        for shard in self._shards:
+            for array in shard:
+                array.flush()
+        meta = {"height": self.height, "width": self.width,
+                "shard_size": self._shard_size, "shard_counts": self._counts}
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path)
+
+
+    def close(self):
+        self.flush()
+        self._shards = []
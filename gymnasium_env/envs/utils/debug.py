@@ -0,0 +1,51 @@
+import logging
+
+
+"""
+Debug output of the package goes through the "gymnasium_env" logger.
+Messages are formatted lazily and hot paths check a cached flag, so
+nothing is formatted while debug is disabled
+"""
+LOGGER_NAME = "gymnasium_env"
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def is_debug_enabled() -> bool:
+    return logging.getLogger(LOGGER_NAME).isEnabledFor(logging.DEBUG)
+
+
+"""
+Enable or disable debug output for the whole package. Envs with a
+"debug" key in their config ignore it, see get_debug_logger
+"""
+def set_debug(enabled: bool) -> None:
+    logger = logging.getLogger(LOGGER_NAME)
+    if not enabled:
+        logger.setLevel(logging.NOTSET)
+        return
+    logger.setLevel(logging.DEBUG)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("[DEBUG] %(message)s"))
+        logger.addHandler(handler)
+
+
+"""
+Logger always enabled at DEBUG level, used by the envs created with
+"debug": True in their config, so that enabling the debug output of one
+env does not change the logging of the others
+"""
+def get_debug_logger() -> logging.Logger:
+    logger = logging.getLogger(LOGGER_NAME + ".debug")
+    # Set even when handlers were already attached (e.g. by the user)
+    logger.setLevel(logging.DEBUG)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("[DEBUG] %(message)s"))
+        logger.addHandler(handler)
+        # Already handled here, not again by the package handler
+        logger.propagate = False
+    return logger
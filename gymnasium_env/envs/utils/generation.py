@@ -1,51 +1,156 @@
-from .dtypes import GRID_SIZE_DTYPE, GRID_DTYPE, GRID_ARR_DTYPE, TileType
+from .dtypes import GRID_SIZE_DTYPE, GRID_DTYPE, GRID_ARR_DTYPE, TileType, GenerationType
 
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 from enum import IntEnum
-import random
 
 
 """
-All Generation functions should: 
+All Generation functions should:
     * have grid height and width as parameters
+    * take the numpy Generator (rng) used for any random choice, so that
+      generation is reproducible from the env seed
+    * accept num_grids, returning a single (height, width) grid when it
+      is None and a batch of shape (num_grids, height, width) otherwise
     * return a valid grid of GRID_ARR_DTYPE
 """
 
 
+def _grid_shape(height, width, num_grids) -> Tuple[int, ...]:
+    if num_grids is None:
+        return (height, width)
+    return (num_grids, height, width)
+
+
+# Generators placing START and END need two distinct cells for them
+def _check_endpoint_cells(height, width, num_cells, unit: str = "tiles"):
+    if num_cells < 2:
+        raise ValueError(f"A {height}x{width} grid has {num_cells} {unit}, "
+                         f"START and END need 2")
+
+
 """
 GenerationType: EMPTY = 0,
 """
-def generation_empty(height: GRID_SIZE_DTYPE, 
-                     width: GRID_SIZE_DTYPE
+def generation_empty(height: GRID_SIZE_DTYPE,
+                     width: GRID_SIZE_DTYPE,
+                     rng: Optional[np.random.Generator] = None,
+                     num_grids: Optional[int] = None
                      ) -> GRID_ARR_DTYPE:
-    return np.full((height, width), TileType.EMPTY, dtype=GRID_DTYPE) 
+    return np.full(_grid_shape(height, width, num_grids), TileType.EMPTY, dtype=GRID_DTYPE)
 
 """
 GenerationType: FULL = 1,
 """
-def generation_full_tile(height: GRID_SIZE_DTYPE, 
-                         width: GRID_SIZE_DTYPE, 
-                         tile_type: IntEnum
+def generation_full_tile(height: GRID_SIZE_DTYPE,
+                         width: GRID_SIZE_DTYPE,
+                         tile_type: IntEnum = TileType.WALL,
+                         rng: Optional[np.random.Generator] = None,
+                         num_grids: Optional[int] = None
                          ) -> GRID_ARR_DTYPE:
-    return np.full((height, width), tile_type, dtype=GRID_DTYPE)
+    return np.full(_grid_shape(height, width, num_grids), tile_type, dtype=GRID_DTYPE)
 
 
 """
 GenerationType: RANDOM = 2,
 """
+DEFAULT_TILE_PROBS = {
+    TileType.EMPTY: 0.7,
+    TileType.WALL: 0.2,
+    TileType.START: 0.05,
+    TileType.END: 0.05,
+}
+
+_tile_samplers = {}
+
+# Tile values and cumulative probabilities, built once per distribution
+def _get_tile_sampler(tile_probs: Dict[IntEnum, float]) -> Tuple[np.ndarray, np.ndarray]:
+    key = tuple(tile_probs.items())
+    if key not in _tile_samplers:
+        probs = np.array(list(tile_probs.values()), dtype=np.float64)
+        assert abs(probs.sum() - 1.0) < 1e-6, "Probabilities must sum to 1.0"
+        cumulative = np.cumsum(probs)
+        cumulative[-1] = 1.0
+        _tile_samplers[key] = (np.array(list(tile_probs.keys()), dtype=GRID_DTYPE), cumulative)
+    return _tile_samplers[key]
+
 def random_gen(height: GRID_SIZE_DTYPE,
                width: GRID_SIZE_DTYPE,
-               tile_probs: Dict[IntEnum, float],
-               rng: np.random.Generator
+               tile_probs: Dict[IntEnum, float] = DEFAULT_TILE_PROBS,
+               rng: Optional[np.random.Generator] = None,
+               num_grids: Optional[int] = None
                ) -> GRID_ARR_DTYPE:
-    tile_types = list(tile_probs.keys())
-    probs = list(tile_probs.values())
-    assert abs(sum(probs) - 1.0) < 1e-6, "Probabilities must sum to 1.0"
+    rng = np.random.default_rng() if rng is None else rng
+    tile_types, cumulative = _get_tile_sampler(tile_probs)
+    samples = rng.random(_grid_shape(height, width, num_grids))
+    return tile_types[np.searchsorted(cumulative, samples, side="right")]
 
-    flat_choices = rng.choice(tile_types, size=(height * width), p=probs)
-    grid = flat_choices.reshape((height, width)).astype(GRID_DTYPE)
-    return grid
+
+"""
+GenerationType: DFS = 3,
+Perfect mazes built with a recursive backtracker. Maze cells are the even
+positions of the grid, the odd positions are the walls between them that
+get carved when the backtracker moves from one cell to the next.
+All the mazes of a batch are built at the same time: every maze pushes and
+pops each of its cells exactly once, so all the stacks advance in lockstep
+and each iteration is a handful of array operations over the batch.
+START and END are placed on two distinct random cells, so the grid must
+have at least 2 cells (a height or a width of 3 or more).
+"""
+DFS_MOVES = np.array([(-1, 0), (1, 0), (0, -1), (0, 1)], dtype=np.intp)
+
+def dfs_gen(height: GRID_SIZE_DTYPE,
+            width: GRID_SIZE_DTYPE,
+            rng: Optional[np.random.Generator] = None,
+            num_grids: Optional[int] = None
+            ) -> GRID_ARR_DTYPE:
+    rng = np.random.default_rng() if rng is None else rng
+    batch = 1 if num_grids is None else num_grids
+    cell_rows, cell_cols = (height + 1) // 2, (width + 1) // 2
+    num_cells = cell_rows * cell_cols
+    _check_endpoint_cells(height, width, num_cells, "maze cells")
+    mazes = np.arange(batch)
+
+    grids = np.full((batch, height, width), TileType.WALL, dtype=GRID_DTYPE)
+    visited = np.zeros((batch, cell_rows + 2, cell_cols + 2), dtype=bool)
+    # Border of already visited cells so neighbors never leave the grid
+    visited[:, 0, :] = visited[:, -1, :] = True
+    visited[:, :, 0] = visited[:, :, -1] = True
+
+    stack = np.zeros((batch, num_cells, 2), dtype=np.intp)
+    start = rng.integers(num_cells, size=batch)
+    stack[:, 0, 0], stack[:, 0, 1] = start // cell_cols, start % cell_cols
+    top = np.zeros(batch, dtype=np.intp)
+    visited[mazes, stack[:, 0, 0] + 1, stack[:, 0, 1] + 1] = True
+    grids[mazes, 2 * stack[:, 0, 0], 2 * stack[:, 0, 1]] = TileType.EMPTY
+
+    for _ in range(2 * num_cells - 1):
+        current = stack[mazes, top]
+        neighbors = current[:, None, :] + DFS_MOVES[None, :, :]
+        free = ~visited[mazes[:, None], neighbors[..., 0] + 1, neighbors[..., 1] + 1]
+
+        # Random free neighbor, or backtrack when there is none
+        choice = np.argmax(rng.random((batch, len(DFS_MOVES))) * free, axis=1)
+        advance = free.any(axis=1)
+        nxt = neighbors[mazes, choice]
+
+        moving = mazes[advance]
+        cur, new = current[advance], nxt[advance]
+        visited[moving, new[:, 0] + 1, new[:, 1] + 1] = True
+        grids[moving, 2 * new[:, 0], 2 * new[:, 1]] = TileType.EMPTY
+        grids[moving, cur[:, 0] + new[:, 0], cur[:, 1] + new[:, 1]] = TileType.EMPTY
+        top[advance] += 1
+        stack[moving, top[advance]] = new
+        top[~advance] -= 1
+
+    # START and END on two distinct cells
+    cell_start = rng.integers(num_cells, size=batch)
+    cell_end = rng.integers(num_cells - 1, size=batch)
+    cell_end += cell_end >= cell_start
+    grids[mazes, 2 * (cell_start // cell_cols), 2 * (cell_start % cell_cols)] = TileType.START
+    grids[mazes, 2 * (cell_end // cell_cols), 2 * (cell_end % cell_cols)] = TileType.END
+
+    return grids[0] if num_grids is None else grids
 
 
 """
@@ -59,11 +164,14 @@ The goal will be the end position [height-1][width-1]
 """
 
 def maze_custom_gen1(height: GRID_SIZE_DTYPE,
-                     width: GRID_SIZE_DTYPE) ->\
+                     width: GRID_SIZE_DTYPE,
+                     rng: Optional[np.random.Generator] = None,
+                     num_grids: Optional[int] = None) ->\
                      GRID_ARR_DTYPE:
-    grid = generation_empty(height, width)
-    grid[0][0] = TileType.START
-    grid[height - 1][width - 1] = TileType.END
+    _check_endpoint_cells(height, width, height * width)
+    grid = generation_empty(height, width, num_grids=num_grids)
+    grid[..., 0, 0] = TileType.START
+    grid[..., height - 1, width - 1] = TileType.END
 
     return grid
 
@@ -72,23 +180,47 @@ Start with an empty grid
 The start and end will be random positions
 """
 def maze_custom_gen2(height: GRID_SIZE_DTYPE,
-                     width: GRID_SIZE_DTYPE
+                     width: GRID_SIZE_DTYPE,
+                     rng: Optional[np.random.Generator] = None,
+                     num_grids: Optional[int] = None
                      ) -> GRID_ARR_DTYPE:
-    grid = generation_empty(height, width)
-
-    start_y = random.randint(0, height - 1)
-    start_x = random.randint(0, width - 1)
-    grid[start_y][start_x] = TileType.START
+    _check_endpoint_cells(height, width, height * width)
+    rng = np.random.default_rng() if rng is None else rng
+    batch = 1 if num_grids is None else num_grids
+    grid = generation_empty(height, width, num_grids=batch)
+    flat = grid.reshape(batch, height * width)
 
     # Gera posição aleatória para o END, garantindo que seja diferente do START
-    while True:
-        end_y = random.randint(0, height - 1)
-        end_x = random.randint(0, width - 1)
-        if (end_y, end_x) != (start_y, start_x):
-            break
-    grid[end_y][end_x] = TileType.END
+    start = rng.integers(height * width, size=batch)
+    end = rng.integers(height * width - 1, size=batch)
+    end += end >= start
+    flat[np.arange(batch), start] = TileType.START
+    flat[np.arange(batch), end] = TileType.END
 
-    return grid
+    return grid[0] if num_grids is None else grid
 
 
+GENERATORS = {
+    GenerationType.EMPTY: generation_empty,
+    GenerationType.FULL: generation_full_tile,
+    GenerationType.RANDOM: random_gen,
+    GenerationType.DFS: dfs_gen,
+    GenerationType.CUSTOM1: maze_custom_gen1,
+    GenerationType.CUSTOM2: maze_custom_gen2,
+}
 
+
+"""
+Generate one grid (num_grids=None) or a batch of grids of the given
+GenerationType. kwargs are the generator specific parameters
+(e.g. tile_type for FULL, tile_probs for RANDOM)
+"""
+def generate(gen_type: GenerationType,
+             height: GRID_SIZE_DTYPE,
+             width: GRID_SIZE_DTYPE,
+             rng: np.random.Generator,
+             num_grids: Optional[int] = None,
+             **kwargs) -> GRID_ARR_DTYPE:
+    if gen_type not in GENERATORS:
+        raise ValueError(f"Unknown generation type: {gen_type}")
+    return GENERATORS[gen_type](height, width, rng=rng, num_grids=num_grids, **kwargs)
@@ -2,6 +2,7 @@ import numpy as np
 from enum import IntEnum
 from typing import Tuple
 from collections import deque
+import hashlib
 
 from .dtypes import TileType
 
@@ -10,19 +11,35 @@ from .dtypes import TileType
 def get_tile_count(grid, tile_type: IntEnum):
     return np.sum(grid == tile_type)
 
+"""
+Count every tile type of a grid in a single pass
+Returns:
+An array indexed by TileType with the number of tiles of each type
+"""
+def get_tile_counts(grid) -> np.ndarray:
+    return np.bincount(np.asarray(grid).ravel(), minlength=len(TileType))
+
 """
 Check if a given maze is solvable
 Returns:
 A bool indicating whether the maze is solvable
 An integer>0 representing the path_length if the 
 maze is solvable and -1 otherwise 
+
+The search itself is done by the backend selected with set_maze_solver
 """
-def is_maze_solvable(grid) -> Tuple[bool, int]:
-    if get_tile_count(grid, TileType.START) > 1:
+def is_maze_solvable(grid, tile_counts=None) -> Tuple[bool, int]:
+    if tile_counts is None:
+        tile_counts = get_tile_counts(grid)
+    if tile_counts[TileType.START] != 1 or tile_counts[TileType.END] != 1:
         return (False, -1)
-    if get_tile_count(grid, TileType.END) > 1:
-        return (False, -1)
-    
+    return _maze_solver(grid)
+
+
+"""
+Cell by cell BFS using a queue
+"""
+def _solve_deque(grid) -> Tuple[bool, int]:
     rows, cols = len(grid), len(grid[0])
     
     # Encontra o ponto de início
@@ -60,15 +77,273 @@ def is_maze_solvable(grid) -> Tuple[bool, int]:
                     queue.append((nr, nc, steps + 1))
 
     return False, -1  # não há caminho
+
+
+"""
+BFS over boolean arrays, the whole frontier is expanded at once
+by shifting it in the four directions
+"""
+def _solve_numpy(grid) -> Tuple[bool, int]:
+    grid = np.asarray(grid)
+    passable = grid != TileType.WALL
+    end = grid == TileType.END
+    frontier = grid == TileType.START
+    reached = frontier.copy()
+    expanded = np.empty_like(frontier)
+
+    steps = 0
+    while frontier.any():
+        if (frontier & end).any():
+            return True, steps
+        expanded[...] = False
+        expanded[1:, :] |= frontier[:-1, :]
+        expanded[:-1, :] |= frontier[1:, :]
+        expanded[:, 1:] |= frontier[:, :-1]
+        expanded[:, :-1] |= frontier[:, 1:]
+        expanded &= passable
+        expanded &= ~reached
+        reached |= expanded
+        frontier, expanded = expanded, frontier
+        steps += 1
+
+    return False, -1
+
+
+"""
+BFS over a bitboard: the passable cells are packed into a single python
+integer (one bit per cell, rows separated by an always blocked guard bit),
+so each BFS layer is a handful of integer shifts and masks
+"""
+def _solve_bitboard(grid) -> Tuple[bool, int]:
+    grid = np.asarray(grid)
+    rows, cols = grid.shape
+    stride = cols + 1
+
+    padded = np.full((rows, stride), TileType.WALL, dtype=grid.dtype)
+    padded[:, :cols] = grid
+    flat = padded.ravel()
+    passable = int.from_bytes(
+        np.packbits(flat != TileType.WALL, bitorder="little").tobytes(), "little")
+    start_bit = 1 << int(np.flatnonzero(flat == TileType.START)[0])
+    end_bit = 1 << int(np.flatnonzero(flat == TileType.END)[0])
+
+    frontier = start_bit
+    available = passable & ~start_bit
+    steps = 0
+    while frontier:
+        if frontier & end_bit:
+            return True, steps
+        frontier = ((frontier << 1) | (frontier >> 1) |
+                    (frontier << stride) | (frontier >> stride)) & available
+        available &= ~frontier
+        steps += 1
+
+    return False, -1
+
+
+MAZE_SOLVERS = {
+    "deque": _solve_deque,
+    "numpy": _solve_numpy,
+    "bitboard": _solve_bitboard,
+}
+
+_maze_solver = _solve_bitboard
+
+
+"""
+Select the BFS backend used by is_maze_solvable, all backends
+return the same (solvable, path_length) values
+"""
+def set_maze_solver(name: str) -> None:
+    global _maze_solver
+    if name not in MAZE_SOLVERS:
+        raise ValueError(f"Unknown maze solver: {name}")
+    _maze_solver = MAZE_SOLVERS[name]
+
+
+
+"""
+Count every tile type of a batch of grids with shape (N, H, W)
+Returns:
+An array of shape (N, len(TileType)) with the tile counts of each grid
+"""
+def get_tile_counts_batch(grids) -> np.ndarray:
+    grids = np.asarray(grids)
+    num_grids, num_types = grids.shape[0], len(TileType)
+    offsets = np.arange(num_grids, dtype=np.intp)[:, None, None] * num_types
+    counts = np.bincount((grids + offsets).ravel(), minlength=num_grids * num_types)
+    return counts.reshape(num_grids, num_types)
+
+
+"""
+Batched version of is_maze_solvable for grids with shape (N, H, W),
+the frontiers of all grids are expanded together
+Returns:
+A bool array of shape (N,) indicating which mazes are solvable
+An int array of shape (N,) with the path lengths, -1 if not solvable
+"""
+def is_maze_solvable_batch(grids, tile_counts=None) -> Tuple[np.ndarray, np.ndarray]:
+    grids = np.asarray(grids)
+    if tile_counts is None:
+        tile_counts = get_tile_counts_batch(grids)
+    active = (tile_counts[:, TileType.START] == 1) & (tile_counts[:, TileType.END] == 1)
+    path_length = np.full(grids.shape[0], -1, dtype=np.int64)
+
+    passable = grids != TileType.WALL
+    end = grids == TileType.END
+    frontier = (grids == TileType.START) & active[:, None, None]
+    reached = frontier.copy()
+    expanded = np.empty_like(frontier)
+
+    steps = 0
+    while active.any():
+        found = active & (frontier & end).any(axis=(1, 2))
+        path_length[found] = steps
+        active &= ~found
+
+        expanded[...] = False
+        expanded[:, 1:, :] |= frontier[:, :-1, :]
+        expanded[:, :-1, :] |= frontier[:, 1:, :]
+        expanded[:, :, 1:] |= frontier[:, :, :-1]
+        expanded[:, :, :-1] |= frontier[:, :, 1:]
+        expanded &= passable
+        expanded &= ~reached
+        expanded &= active[:, None, None]
+        reached |= expanded
+        frontier, expanded = expanded, frontier
+
+        active &= frontier.any(axis=(1, 2))
+        steps += 1
+
+    return path_length >= 0, path_length
     
 
 
     
     
+"""
+Label the connected regions (4-neighborhood) of non-wall tiles of grids
+with shape (N, H, W), all the grids at once, with an array based
+union-find over the flattened cells:
+    * every pair of adjacent non-wall cells is an edge
+    * each round hooks the root of the larger index to the smaller one
+      for all the edges joining different trees at once, then compresses
+      the trees until every cell points to its root
+    * edges inside a single tree are dropped, so rounds get cheaper
+Returns:
+An int array of shape (N, H, W) with the region of each cell, numbered
+from 0 in each grid, and -1 on walls
+An int array of shape (N,) with the number of regions of each grid
+A list with the array of region sizes of each grid
+"""
+def label_regions_batch(grids) -> Tuple[np.ndarray, np.ndarray, list]:
+    grids = np.asarray(grids)
+    num_grids = grids.shape[0]
+    if num_grids == 0:
+        return np.zeros(grids.shape, dtype=np.intp), np.zeros(0, dtype=np.intp), []
+    passable = grids != TileType.WALL
+    num_cells = grids.size
+    cell_ids = np.arange(num_cells, dtype=np.intp)
+    ids = cell_ids.reshape(grids.shape)
+
+    horizontal = passable[:, :, 1:] & passable[:, :, :-1]
+    vertical = passable[:, 1:, :] & passable[:, :-1, :]
+    u = np.concatenate([ids[:, :, :-1][horizontal], ids[:, :-1, :][vertical]])
+    v = np.concatenate([ids[:, :, 1:][horizontal], ids[:, 1:, :][vertical]])
+
+    parent = cell_ids.copy()
+    while len(u) > 0:
+        root_u, root_v = parent[u], parent[v]
+        joining = root_u != root_v
+        if not joining.any():
+            break
+        u, v = u[joining], v[joining]
+        root_u, root_v = root_u[joining], root_v[joining]
+        # Parents always have a smaller index, so no cycle can appear
+        np.minimum.at(parent, np.maximum(root_u, root_v), np.minimum(root_u, root_v))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    # The root of each region is its first cell
+    is_root = passable.ravel() & (parent == cell_ids)
+    num_regions = is_root.reshape(grids.shape).sum(axis=(1, 2))
+    root_rank = np.cumsum(is_root) - 1
+    first_region = np.concatenate([[0], np.cumsum(num_regions)[:-1]])
+
+    regions = np.full(num_cells, -1, dtype=np.intp)
+    passable_cells = np.flatnonzero(passable.ravel())
+    global_regions = root_rank[parent[passable_cells]]
+    grid_ids = passable_cells // max(grids.shape[1] * grids.shape[2], 1)
+    regions[passable_cells] = global_regions - first_region[grid_ids]
+
+    sizes = np.bincount(global_regions, minlength=int(num_regions.sum()))
+    return (regions.reshape(grids.shape), num_regions,
+            np.split(sizes, np.cumsum(num_regions)[:-1]))
+
+
+"""
+Connected regions of non-wall tiles of a single grid
+Returns the region of each cell (-1 on walls) and the region sizes
+"""
+def label_regions(grid) -> Tuple[np.ndarray, np.ndarray]:
+    regions, _, sizes = label_regions_batch(np.asarray(grid)[None])
+    return regions[0], sizes[0]
+
+
 def get_num_regions(grid) -> int:
-    ...
+    return int(label_regions_batch(np.asarray(grid)[None])[1][0])
+
+
+def get_num_regions_batch(grids) -> np.ndarray:
+    return label_regions_batch(grids)[1]
+
+
+"""
+View of an array that can not be written through, used to hand out
+internal buffers without copying them
+"""
+def read_only_view(array: np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
 
 
 def obs_to_key(obs: dict) -> tuple:
     return tuple(obs["pos"].flatten()) + tuple(obs["grid"].flatten())
 
+
+
+TILE_BITS = 2
+TILES_PER_BYTE = 8 // TILE_BITS
+TILE_SHIFTS = np.arange(0, 8, TILE_BITS, dtype=np.uint8)
+
+"""
+Pack grids with shape (..., H, W) to 2 bits per tile (the 4 TileType
+values), 4 tiles per byte in row-major order
+Returns an uint8 array with shape (..., ceil(H * W / 4))
+"""
+def pack_grids(grids) -> np.ndarray:
+    grids = np.asarray(grids, dtype=np.uint8)
+    tiles = grids.reshape(*grids.shape[:-2], -1)
+    padding = -tiles.shape[-1] % TILES_PER_BYTE
+    if padding:
+        tiles = np.concatenate([tiles, np.zeros((*tiles.shape[:-1], padding), dtype=np.uint8)], axis=-1)
+    tiles = tiles.reshape(*tiles.shape[:-1], -1, TILES_PER_BYTE)
+    return np.bitwise_or.reduce(tiles << TILE_SHIFTS, axis=-1).astype(np.uint8)
+
+def unpack_grids(packed, height: int, width: int) -> np.ndarray:
+    packed = np.asarray(packed, dtype=np.uint8)
+    tiles = (packed[..., None] >> TILE_SHIFTS) & ((1 << TILE_BITS) - 1)
+    # Explicit size, -1 can not be inferred for an empty batch
+    tiles = tiles.reshape(*packed.shape[:-1], packed.shape[-1] * 8 // TILE_BITS)[..., :height * width]
+    return tiles.reshape(*packed.shape[:-1], height, width)
+
+
+# 64 bits hash of each row of packed grids with shape (N, B)
+def hash_packed_grids(packed) -> np.ndarray:
+    packed = np.ascontiguousarray(packed)
+    return np.array([int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8).digest(), "little")
+                     for row in packed], dtype=np.uint64)
@@ -0,0 +1,106 @@
+from .dtypes import GRID_DTYPE, GRID_SIZE_DTYPE, GenerationType
+from .generation import generate
+from .rewards import RewardStrategy, TILE_COUNT_STATS, PATH_STATS
+from .debug import get_logger
+
+from typing import Dict, Optional
+import numpy as np
+import os
+
+logger = get_logger(__name__)
+
+
+"""
+Pool of pre-generated initial levels
+
+The levels are stored as a .npy file of shape (N, H, W) that is opened as
+a read-only memory map, so that sampling a level costs a copy of one grid
+and the pages are shared by every process using the same pool. The stats
+of every level (tile counts, solvability and path length) are computed
+once when the pool is built and saved next to it in a _stats.npz file
+"""
+POOL_STATS = list(TILE_COUNT_STATS) + list(PATH_STATS)
+
+
+def get_stats_path(path: str) -> str:
+    return os.path.splitext(path)[0] + "_stats.npz"
+
+
+"""
+Generate num_levels grids with the given GenerationType and store them,
+with their stats, as a level pool at path (a .npy file).
+Levels are generated and written batch_size at a time, so that pools
+larger than memory can be built
+"""
+def build_level_pool(path: str,
+                     gen_type: GenerationType,
+                     height: GRID_SIZE_DTYPE,
+                     width: GRID_SIZE_DTYPE,
+                     num_levels: int,
+                     seed: Optional[int] = None,
+                     batch_size: int = 4096,
+                     **gen_kwargs) -> "LevelPool":
+    rng = np.random.default_rng(seed)
+    strategy = RewardStrategy()
+    for key in POOL_STATS:
+        strategy.set_stats(key)
+
+    grids = np.lib.format.open_memmap(path, mode="w+", dtype=GRID_DTYPE,
+                                      shape=(num_levels, height, width))
+    stats = {}
+    for begin in range(0, num_levels, batch_size):
+        end = min(begin + batch_size, num_levels)
+        batch = generate(gen_type, height, width, rng, end - begin, **gen_kwargs)
+        grids[begin:end] = batch
+        for key, value in strategy.compute_stats_batch(batch).items():
+            if key not in stats:
+                stats[key] = np.zeros(num_levels, dtype=value.dtype)
+            stats[key][begin:end] = value
+        logger.debug("Level pool %s: %d/%d levels", path, end, num_levels)
+
+    grids.flush()
+    del grids
+    np.savez(get_stats_path(path), **stats)
+    return LevelPool(path)
+
+
+class LevelPool():
+    def __init__(self, path: str):
+        self.path = path
+        self.grids = np.load(path, mmap_mode="r")
+        if self.grids.ndim != 3:
+            raise ValueError(f"Level pool must have shape (N, H, W), got {self.grids.shape}")
+        stats_path = get_stats_path(path)
+        self.stats = {}
+        if os.path.exists(stats_path):
+            with np.load(stats_path) as stats:
+                self.stats = {key: stats[key] for key in stats.files}
+
+
+    def __len__(self) -> int:
+        return self.grids.shape[0]
+
+
+    @property
+    def shape(self):
+        return self.grids.shape[1:]
+
+
+    # Random level indices, a single index when size is None
+    def sample(self, rng: np.random.Generator, size: Optional[int] = None):
+        return rng.integers(len(self), size=size)
+
+
+    # Copies of the levels at indices, they can be edited freely
+    def get_grids(self, indices) -> np.ndarray:
+        return np.array(self.grids[indices], dtype=GRID_DTYPE)
+
+
+    """
+    Precomputed stats of the levels at indices for the given keys,
+    None if any of them was not stored in the pool
+    """
+    def get_stats(self, indices, keys) -> Optional[Dict[str, np.ndarray]]:
+        if any(key not in self.stats for key in keys):
+            return None
+        return {key: self.stats[key][indices] for key in keys}
@@ -0,0 +1,74 @@
+from gymnasium import spaces
+import numpy as np
+
+
+"""
+Compact observation layouts, selected with the "observation" key of the
+env config:
+    * "dict": the default spaces.Dict with grid, pos and heatmap
+    * "flat": a single (C, H, W) uint8 tensor with one channel per tile
+      type (one-hot), one position mask channel (narrow only) and the
+      heatmap as last channel
+    * "packed": a (2, H, W) uint8 tensor, the one-hot tiles and position
+      mask packed as bits of the first channel (tile t is bit t, the
+      position is bit num_tiles) and the heatmap as second channel
+
+Tiles with values outside the tile types (e.g. padding of egocentric
+observations) have all their tile channels/bits set to zero.
+All the encoders work on batches, with a leading N dimension
+"""
+OBSERVATION_LAYOUTS = ["dict", "flat", "packed"]
+
+
+def get_num_channels(layout: str, num_tiles: int, with_pos: bool) -> int:
+    if layout == "flat":
+        return num_tiles + int(with_pos) + 1
+    if layout == "packed":
+        if num_tiles + int(with_pos) > 8:
+            raise ValueError("Packed observations support at most 8 bits per cell")
+        return 2
+    raise ValueError(f"Unknown observation layout: {layout}")
+
+
+def get_flat_observation_space(layout: str,
+                               height: int,
+                               width: int,
+                               num_tiles: int,
+                               with_pos: bool,
+                               max_changes: int) -> spaces.Box:
+    num_channels = get_num_channels(layout, num_tiles, with_pos)
+    high = np.ones((num_channels, height, width), dtype=np.uint8)
+    if layout == "packed":
+        high[0] = (1 << (num_tiles + int(with_pos))) - 1
+    high[-1] = min(max_changes, np.iinfo(np.uint8).max)
+    return spaces.Box(low=0, high=high, dtype=np.uint8)
+
+
+"""
+Write the observations of N envs into out, an uint8 array with shape
+(N, C, H, W). grids and heatmaps have shape (N, H, W) and positions
+(N, 2) as (x, y), or None for representations without position
+"""
+def encode_observation(layout: str,
+                       grids: np.ndarray,
+                       positions,
+                       heatmaps: np.ndarray,
+                       num_tiles: int,
+                       out: np.ndarray) -> np.ndarray:
+    env_ids = np.arange(grids.shape[0])
+    if layout == "flat":
+        tile_ids = np.arange(num_tiles, dtype=grids.dtype)[:, None, None]
+        np.equal(grids[:, None], tile_ids, out=out[:, :num_tiles].view(np.bool_))
+        if positions is not None:
+            out[:, num_tiles] = 0
+            out[env_ids, num_tiles, positions[:, 1], positions[:, 0]] = 1
+    elif layout == "packed":
+        np.left_shift(1, grids, out=out[:, 0], dtype=np.uint8)
+        # Padding tiles outside the tile types have no bit set, as in "flat"
+        np.bitwise_and(out[:, 0], (1 << num_tiles) - 1, out=out[:, 0])
+        if positions is not None:
+            out[env_ids, 0, positions[:, 1], positions[:, 0]] |= np.uint8(1 << num_tiles)
+    else:
+        raise ValueError(f"Unknown observation layout: {layout}")
+    out[:, -1] = heatmaps
+    return out
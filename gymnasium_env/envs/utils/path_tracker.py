@@ -0,0 +1,207 @@
+from .dtypes import TileType
+from .helper import get_tile_counts
+
+from collections import deque
+from typing import Tuple
+import numpy as np
+
+
+UNREACHABLE = np.iinfo(np.int32).max
+# Plain int, looking TileType.WALL up on every neighbor dominates the loops
+WALL = int(TileType.WALL)
+DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+"""
+Keeps the START -> END shortest path of a maze up to date while the grid
+is edited one tile at a time.
+
+The tracker stores one shortest path plus the BFS distances from START and
+from END. After a full recompute the distances are exact; afterwards they
+are kept as lower bounds of the real distances, which is enough to decide
+when an edit cannot change the path length:
+    * a wall placed outside the stored path keeps that path valid
+    * a wall removed where no path through it can beat the current length
+      keeps the current path (or the lack of one)
+Any other edit, and every edit touching START or END, falls back to a full
+recompute.
+
+Edits can also be deferred and applied by sync, only when the path is
+needed (e.g. on a stats cache miss). More than one edit between two syncs
+is a full recompute, as the incremental updates handle a single edit.
+"""
+class PathTracker():
+    def __init__(self):
+        self._grid = None
+        self._dist_start = None
+        self._dist_end = None
+        self._path = None
+        self._solvable = False
+        self._path_length = -1
+        # Deferred edit and whether the stored path is out of date
+        self._pending = None
+        self._stale = False
+        self.num_updates = 0
+        self.num_recomputes = 0
+
+
+    """
+    Track a new grid, with lazy the recompute waits for the next sync
+    """
+    def reset(self, grid, lazy: bool = False) -> Tuple[bool, int]:
+        self._grid = grid
+        self._pending = None
+        self._stale = lazy
+        if not lazy:
+            self._recompute()
+        return self.get_path()
+
+
+    # Same as update, but only applied by the next sync
+    def defer(self, x: int, y: int, old_tile: int, new_tile: int):
+        if self._pending is not None:
+            self._stale = True
+        self._pending = (x, y, old_tile, new_tile)
+
+
+    # Apply the deferred edits and return the up to date path
+    def sync(self) -> Tuple[bool, int]:
+        pending, self._pending = self._pending, None
+        if self._stale:
+            self._stale = False
+            self._recompute()
+        elif pending is not None:
+            self.update(*pending)
+        return self.get_path()
+
+
+    def get_path(self) -> Tuple[bool, int]:
+        return self._solvable, self._path_length
+
+
+    """
+    Update the path after the tile at (x, y) changed from old_tile to new_tile.
+    The grid given on reset must already hold new_tile at (x, y)
+    """
+    def update(self, x: int, y: int, old_tile: int, new_tile: int) -> Tuple[bool, int]:
+        self.num_updates += 1
+        if old_tile == new_tile:
+            return self.get_path()
+
+        endpoints = (TileType.START, TileType.END)
+        if old_tile in endpoints or new_tile in endpoints:
+            self._recompute()
+        elif new_tile == TileType.WALL:
+            self._add_wall(x, y)
+        elif old_tile == TileType.WALL:
+            self._remove_wall(x, y)
+
+        return self.get_path()
+
+
+    def _add_wall(self, x, y):
+        # Walls can only make distances longer, so the stored distances are
+        # still lower bounds and a path that avoids (x, y) is still shortest
+        if self._solvable and self._path[y, x]:
+            self._recompute()
+
+
+    def _remove_wall(self, x, y):
+        best_start = self._best_neighbor(self._dist_start, x, y)
+        best_end = self._best_neighbor(self._dist_end, x, y)
+        self._dist_start[y, x] = best_start
+        self._dist_end[y, x] = best_end
+
+        if best_start != UNREACHABLE and best_end != UNREACHABLE:
+            # Lower bound for the length of any path going through (x, y)
+            through = best_start + best_end
+            if not self._solvable or through < self._path_length:
+                self._recompute()
+                return
+
+        self._relax(self._dist_start, x, y)
+        self._relax(self._dist_end, x, y)
+
+
+    def _best_neighbor(self, dist, x, y) -> int:
+        rows, cols = self._grid.shape
+        best = UNREACHABLE
+        for dr, dc in DIRECTIONS:
+            nr, nc = y + dr, x + dc
+            if 0 <= nr < rows and 0 <= nc < cols and self._grid[nr, nc] != WALL:
+                best = min(best, dist[nr, nc])
+        return best if best == UNREACHABLE else best + 1
+
+
+    # Propagate shorter distances opened by a removed wall
+    def _relax(self, dist, x, y):
+        if dist[y, x] == UNREACHABLE:
+            return
+        rows, cols = self._grid.shape
+        queue = deque([(y, x)])
+        while queue:
+            r, c = queue.popleft()
+            next_dist = dist[r, c] + 1
+            for dr, dc in DIRECTIONS:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < rows and 0 <= nc < cols \
+                        and self._grid[nr, nc] != WALL \
+                        and next_dist < dist[nr, nc]:
+                    dist[nr, nc] = next_dist
+                    queue.append((nr, nc))
+
+
+    def _recompute(self):
+        self.num_recomputes += 1
+        shape = self._grid.shape
+        self._path = np.zeros(shape, dtype=bool)
+        self._solvable, self._path_length = False, -1
+
+        tile_counts = get_tile_counts(self._grid)
+        if tile_counts[TileType.START] != 1 or tile_counts[TileType.END] != 1:
+            # Without a single START and END no path can be valid, so every
+            # removed wall will go through a recompute
+            self._dist_start = np.full(shape, UNREACHABLE, dtype=np.int32)
+            self._dist_end = np.full(shape, UNREACHABLE, dtype=np.int32)
+            return
+
+        start = tuple(np.argwhere(self._grid == TileType.START)[0])
+        end = tuple(np.argwhere(self._grid == TileType.END)[0])
+        self._dist_start = self._bfs(start)
+        self._dist_end = self._bfs(end)
+
+        if self._dist_start[end] == UNREACHABLE:
+            return
+
+        self._solvable = True
+        self._path_length = int(self._dist_start[end])
+
+        # Walk back from END following decreasing distances from START
+        rows, cols = shape
+        r, c = end
+        self._path[r, c] = True
+        while (r, c) != start:
+            for dr, dc in DIRECTIONS:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < rows and 0 <= nc < cols \
+                        and self._dist_start[nr, nc] == self._dist_start[r, c] - 1:
+                    r, c = nr, nc
+                    break
+            self._path[r, c] = True
+
+
+    def _bfs(self, source) -> np.ndarray:
+        rows, cols = self._grid.shape
+        dist = np.full((rows, cols), UNREACHABLE, dtype=np.int32)
+        dist[source] = 0
+        queue = deque([source])
+        while queue:
+            r, c = queue.popleft()
+            for dr, dc in DIRECTIONS:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < rows and 0 <= nc < cols \
+                        and dist[nr, nc] == UNREACHABLE \
+                        and self._grid[nr, nc] != WALL:
+                    dist[nr, nc] = dist[r, c] + 1
+                    queue.append((nr, nc))
+        return dist
@@ -1,6 +1,6 @@
 from gymnasium_env.envs.utils.helper import *
 from gymnasium_env.envs.utils.dtypes import TileType
-import config
+from gymnasium_env.envs.utils.stats_cache import StatsCache
 from functools import partial
 from typing import Callable
 from functools import partial
@@ -17,6 +17,27 @@ POSSIBLE_MAZE_REWARDS = {
         "num_regions": get_num_regions
 }
 
+"""
+Stats that can be derived from shared intermediate results, so that
+compute_stats only counts tiles once and runs a single BFS per grid
+"""
+TILE_COUNT_STATS = {
+        "num_empty": TileType.EMPTY,
+        "num_wall": TileType.WALL,
+        "num_start": TileType.START,
+        "num_end": TileType.END,
+}
+
+PATH_STATS = {
+        "is_grid_solvable": 0,
+        "path_length": 1,
+}
+
+# Batched versions of the other stats, used by compute_stats_batch
+BATCH_STATS = {
+        "num_regions": get_num_regions_batch,
+}
+
 
 class RewardStrategy():
     def __init__(self):
@@ -24,6 +45,13 @@ class RewardStrategy():
         self.weight_dict = {}
         self.stats_dict = {}
         self.episode_end_cond = {}
+        # Optional batched versions of the reward functions
+        self.batch_reward_dict = {}
+        # Evaluation plan built by compile()
+        self._reward_plan = None
+        self._end_conds = None
+        # Optional memo of the stats of already seen grids
+        self._stats_cache = None
 
     """
     The first thing to define is the possible stats that 
@@ -40,11 +68,109 @@ class RewardStrategy():
         self.stats_dict[key] = POSSIBLE_MAZE_REWARDS[key]
         return True
     
-    def compute_stats(self, grid) -> dict:
+    """
+    Whether any registered stat depends on the START -> END path,
+    in which case the caller may keep it updated with a PathTracker
+    """
+    def uses_path_stats(self) -> bool:
+        return any(key in PATH_STATS for key in self.stats_dict)
+
+    """
+    Reuse the stats of already seen grids from a StatsCache, None disables it
+    """
+    def set_stats_cache(self, cache: StatsCache):
+        self._stats_cache = cache
+
+    def get_stats_cache(self) -> StatsCache:
+        return self._stats_cache
+
+    """
+    Stats of the grid, path is its (solvable, path length) when already
+    known, or a function returning it which is only called when the path
+    stats are not cached
+    """
+    def compute_stats(self, grid, path=None) -> dict:
+        if self._stats_cache is None:
+            return self._compute_stats(grid, path)
+        key = StatsCache.get_key(grid)
+        entry = self._stats_cache.get(key, self.stats_dict)
+        if entry is not None and all(stat in entry for stat in self.stats_dict):
+            return {stat: entry[stat] for stat in self.stats_dict}
+
+        stats = self._compute_stats(grid, path)
+        if entry is None:
+            entry = {}
+        entry.update(stats)
+        self._stats_cache.put(key, entry)
+        return stats
+
+    def _compute_stats(self, grid, path=None) -> dict:
+        tile_counts = get_tile_counts(grid)
+        stats = {}
+        for key, func in self.stats_dict.items():
+            if key in TILE_COUNT_STATS:
+                stats[key] = tile_counts[TILE_COUNT_STATS[key]]
+            elif key in PATH_STATS:
+                # Solvability and path length share the same BFS
+                if path is None:
+                    path = is_maze_solvable(grid, tile_counts)
+                elif callable(path):
+                    path = path()
+                stats[key] = path[PATH_STATS[key]]
+            else:
+                stats[key] = func(grid)
+
+        return stats
+
+    """
+    Batched version of compute_stats for grids with shape (N, H, W)
+    Returns a dict with an array of shape (N,) for each registered stat
+    """
+    def compute_stats_batch(self, grids) -> dict:
+        grids = np.asarray(grids)
+        if self._stats_cache is None:
+            return self._compute_stats_batch(grids)
+
+        keys = [StatsCache.get_key(grid) for grid in grids]
+        entries = [self._stats_cache.get(key, self.stats_dict) for key in keys]
+        missing = np.array([entry is None or any(stat not in entry for stat in self.stats_dict)
+                            for entry in entries], dtype=np.bool_)
+        cached = np.flatnonzero(~missing)
+        if not missing.any():
+            return {stat: np.array([entries[i][stat] for i in cached]) for stat in self.stats_dict}
+
+        ids = np.flatnonzero(missing)
+        new_stats = self._compute_stats_batch(grids[ids])
+        for j, i in enumerate(ids):
+            entry = entries[i] if entries[i] is not None else {}
+            entry.update({stat: value[j] for stat, value in new_stats.items()})
+            self._stats_cache.put(keys[i], entry)
+        if len(cached) == 0:
+            return new_stats
+
+        stats = {}
+        for stat, value in new_stats.items():
+            stats[stat] = np.empty(len(grids), dtype=value.dtype)
+            stats[stat][ids] = value
+            stats[stat][cached] = [entries[i][stat] for i in cached]
+        return stats
+
+    def _compute_stats_batch(self, grids) -> dict:
+        tile_counts = get_tile_counts_batch(grids)
+        path = None
         stats = {}
         for key, func in self.stats_dict.items():
-            stats[key] = func(grid)  
-            
+            if key in TILE_COUNT_STATS:
+                stats[key] = tile_counts[:, TILE_COUNT_STATS[key]]
+            elif key in PATH_STATS:
+                if path is None:
+                    path = is_maze_solvable_batch(grids, tile_counts)
+                stats[key] = path[PATH_STATS[key]]
+            elif key in BATCH_STATS:
+                stats[key] = BATCH_STATS[key](grids)
+            else:
+                stats[key] = np.array([func(grid) for grid in grids])
+
         return stats
     
     
@@ -57,12 +183,15 @@ class RewardStrategy():
         if key not in self.stats_dict.keys():
             return False
         self.reward_dict[key] = reward
+        self.batch_reward_dict.pop(key, None)
+        self._reward_plan = None
         return True
 
     def set_key_weight(self, key, weight) -> bool:
         if key not in self.stats_dict.keys():
             return False
         self.weight_dict[key] = weight
+        self._reward_plan = None
         return True
     
     
@@ -70,32 +199,88 @@ class RewardStrategy():
     After defining the reward and weight functions, we
     can get the rewards given a set of stats
     """
-    def set_reward_function(self, key: str, fn: Callable[[dict], float]):
+    """
+    Reward functions receive (new_stats) or (new_stats, old_stats).
+    batch_fn, if given, receives the same arguments with stats arrays of
+    shape (N,) and returns the N rewards; it is used by get_rewards_batch
+    """
+    def set_reward_function(self, key: str, fn: Callable[[dict], float], batch_fn=None):
         self.reward_dict[key] = fn
+        if batch_fn is not None:
+            self.batch_reward_dict[key] = batch_fn
+        else:
+            self.batch_reward_dict.pop(key, None)
+        self._reward_plan = None
+
+    """
+    Reward based on get_range_reward, with its batched version
+    """
+    def set_range_reward(self, key: str, low, high):
+        self.set_reward_function(
+            key,
+            lambda new_stats, old_stats: get_range_reward(new_stats[key], old_stats[key], low, high),
+            batch_fn=lambda new_stats, old_stats: get_range_reward_batch(new_stats[key], old_stats[key], low, high))
+
+    """
+    Resolve once the arity and weight of each reward function and the
+    episode end conditions, so that get_rewards only has to call them.
+    It is called automatically after any change to the strategy
+    """
+    def compile(self):
+        plan = []
+        for key, fn in self.reward_dict.items():
+            # Parameters with default values (e.g. k=key) are not stats
+            required = [param for param in inspect.signature(fn).parameters.values()
+                        if param.default is inspect.Parameter.empty]
+            plan.append((key, fn, self.batch_reward_dict.get(key),
+                         self.weight_dict.get(key, 1.0), len(required) > 1))
+        self._reward_plan = plan
+        self._end_conds = list(self.episode_end_cond.values())
 
     def get_rewards(self, new_stats: dict, old_stats: dict) -> dict:
-        config.debug_print("[REWARDS MODULE] [get_rewards]")
-        # if config.DEBUG_MODE:
-        #     for key, value in new_stats.items():
-        #         config.debug_print(f'Stat {key}: {value}')
-        #         config.debug_print(f'Old stat {key}: {old_stats[key]}')
+        if self._reward_plan is None:
+            self.compile()
         rewards = 0
-        for key in self.reward_dict:
-            num_params = len(inspect.signature(self.reward_dict[key]).parameters)
-            if num_params == 1:
-                reward_value = self.reward_dict[key](new_stats)
-            else:
-                reward_value = self.reward_dict[key](new_stats, old_stats)
-            weight = self.weight_dict.get(key, 1.0)
-            
-
-            weighted_reward = reward_value * weight
-            rewards += weighted_reward
+        for key, fn, _, weight, takes_old in self._reward_plan:
+            reward_value = fn(new_stats, old_stats) if takes_old else fn(new_stats)
+            rewards += reward_value * weight
             # if old_stats == new_stats:
             #     rewards += -10  # Penalize no changes between states
-            config.debug_print(f"Reward {reward_value} for key {key}, weighted: {weighted_reward}")
+        return rewards
+
+    """
+    Unweighted and weighted reward of each key, the terms summed by
+    get_rewards. Nothing is logged here, so the caller (e.g. PcgrlEnv with
+    its own debug setting) decides where the terms go
+    """
+    def get_reward_terms(self, new_stats: dict, old_stats: dict) -> dict:
+        if self._reward_plan is None:
+            self.compile()
+        terms = {}
+        for key, fn, _, weight, takes_old in self._reward_plan:
+            reward_value = fn(new_stats, old_stats) if takes_old else fn(new_stats)
+            terms[key] = (reward_value, reward_value * weight)
+        return terms
 
-        config.debug_print(f"Total weighted reward: {rewards}")
+    """
+    Batched version of get_rewards, stats are dicts of arrays with shape (N,)
+    Reward functions without a batched version are called for each element
+    """
+    def get_rewards_batch(self, new_stats: dict, old_stats: dict) -> np.ndarray:
+        if self._reward_plan is None:
+            self.compile()
+        num_stats = len(next(iter(new_stats.values())))
+        rewards = np.zeros(num_stats, dtype=np.float64)
+        for key, fn, batch_fn, weight, takes_old in self._reward_plan:
+            if batch_fn is not None:
+                reward_value = batch_fn(new_stats, old_stats) if takes_old else batch_fn(new_stats)
+            else:
+                reward_value = np.empty(num_stats, dtype=np.float64)
+                for i in range(num_stats):
+                    new_i = {k: v[i] for k, v in new_stats.items()}
+                    old_i = {k: v[i] for k, v in old_stats.items()}
+                    reward_value[i] = fn(new_i, old_i) if takes_old else fn(new_i)
+            rewards += reward_value * weight
         return rewards
 
 
@@ -106,10 +291,26 @@ class RewardStrategy():
         if key not in self.stats_dict.keys():
             return False
         self.episode_end_cond[key] = cond_fn
+        self._reward_plan = None
         return True
 
     def get_episode_over(self, new_stats: dict, old_stats: dict) -> bool:
-        return all(cond(new_stats) for cond in self.episode_end_cond.values())
+        if self._reward_plan is None:
+            self.compile()
+        return all(cond(new_stats) for cond in self._end_conds)
+
+    """
+    Batched version of get_episode_over, the end conditions must be
+    elementwise expressions on the stats arrays (e.g. stats[k] >= 5)
+    """
+    def get_episode_over_batch(self, new_stats: dict, old_stats: dict) -> np.ndarray:
+        if self._reward_plan is None:
+            self.compile()
+        num_stats = len(next(iter(new_stats.values())))
+        done = np.ones(num_stats, dtype=np.bool_)
+        for cond in self._end_conds:
+            done &= np.asarray(cond(new_stats), dtype=np.bool_)
+        return done
 
 
     def debug_info(self):
@@ -122,9 +323,6 @@ class RewardStrategy():
     
    
 def get_range_reward(new_value, old_value, low, high):
-    config.debug_print("[REWARDS MODULE] [get_range_rewards]")
-    config.debug_print(f'new_value: {new_value} old_value: {old_value} low: {low} high: {high}')
-    
     # Calculate if the new and old values are inside the range
     new_in = low <= new_value <= high
     old_in = low <= old_value <= high
@@ -171,6 +369,38 @@ def get_range_reward(new_value, old_value, low, high):
     # Default
     return 0.0
 
+"""
+Batched version of get_range_reward for arrays of new and old values
+"""
+def get_range_reward_batch(new_value, old_value, low, high) -> np.ndarray:
+    new_value = np.asarray(new_value, dtype=np.float64)
+    old_value = np.asarray(old_value, dtype=np.float64)
+    new_in = (low <= new_value) & (new_value <= high)
+    old_in = (low <= old_value) & (old_value <= high)
+    no_change = new_value == old_value
+
+    # Same cases and order as get_range_reward
+    conditions = [
+        new_in & old_in,
+        (new_value < low) & (old_value < low),
+        (new_value > high) & (old_value > high),
+        (new_value > high) & (old_value < low),
+        (new_value < low) & (old_value > high),
+        new_in != old_in,
+    ]
+    # Infinite bounds give nan on branches that are never selected
+    with np.errstate(invalid="ignore"):
+        choices = [
+            0.0,
+            np.where(no_change, -1.0, new_value - old_value),
+            np.where(no_change, -1.0, old_value - new_value),
+            (high - new_value) + (old_value - low),
+            (high - old_value) + (new_value - low),
+            -1.0,
+        ]
+        return np.select(conditions, choices, default=0.0)
+
+
 def get_range_reward2(new_value, old_value, low, high):
     if new_value >= low and new_value <= high and old_value >= low and old_value <= high:
         return 0
@@ -232,21 +462,13 @@ def maze_reward_scenario3(target_path_length=11) -> RewardStrategy:
     strategy = RewardStrategy()
     key = "path_length"
     strategy.set_stats(key)
-    strategy.set_reward_function(key, lambda new_stats, old_stats, k=key: 
-                                 get_range_reward(new_stats[k], 
-                                                  old_stats[k], 
-                                                  low=target_path_length, 
-                                                  high=target_path_length))
+    strategy.set_range_reward(key, low=target_path_length, high=target_path_length)
     strategy.set_key_weight(key, 1)
     strategy.set_episode_end_cond(key, lambda stats, k=key: stats[k] >= target_path_length)
 
     key = "num_wall"
     strategy.set_stats(key)
-    strategy.set_reward_function(key, lambda new_stats, old_stats, k=key: 
-                                 get_range_reward(new_stats[k], 
-                                                  old_stats[k], 
-                                                  low=np.inf, 
-                                                  high=np.inf))
+    strategy.set_range_reward(key, low=np.inf, high=np.inf)
     strategy.set_key_weight(key, 1)
     strategy.set_episode_end_cond(key, lambda stats, k=key: stats[k] >= 5)
 
@@ -257,41 +479,25 @@ def maze_reward_scenario4(target_path_length=15) -> RewardStrategy:
     strategy = RewardStrategy()
     key = "path_length"
     strategy.set_stats(key)
-    strategy.set_reward_function(key, lambda new_stats, old_stats, k=key: 
-                                 get_range_reward(new_stats[k], 
-                                                  old_stats[k], 
-                                                  low=np.inf, 
-                                                  high=np.inf))
+    strategy.set_range_reward(key, low=np.inf, high=np.inf)
     strategy.set_key_weight(key, 1)
     strategy.set_episode_end_cond(key, lambda stats, k=key: stats[k] >= target_path_length)
     
     key = "num_wall"
     strategy.set_stats(key)
-    strategy.set_reward_function(key, lambda new_stats, old_stats, k=key: 
-                                 get_range_reward(new_stats[k], 
-                                                  old_stats[k], 
-                                                  low=np.inf, 
-                                                  high=np.inf))
+    strategy.set_range_reward(key, low=np.inf, high=np.inf)
     strategy.set_key_weight(key, 1)
     strategy.set_episode_end_cond(key, lambda stats, k=key: stats[k] >= 10)
     
     key = "num_start"
     strategy.set_stats(key)
-    strategy.set_reward_function(key, lambda new_stats, old_stats, k=key: 
-                                 get_range_reward(new_stats[k], 
-                                                  old_stats[k], 
-                                                  low=1, 
-                                                  high=1))
+    strategy.set_range_reward(key, low=1, high=1)
     strategy.set_key_weight(key, 1)
     strategy.set_episode_end_cond(key, lambda stats, k=key: stats[k] == 1)
 
     key = "num_end"
     strategy.set_stats(key)
-    strategy.set_reward_function(key, lambda new_stats, old_stats, k=key: 
-                                 get_range_reward(new_stats[k], 
-                                                  old_stats[k], 
-                                                  low=1, 
-                                                  high=1))
+    strategy.set_range_reward(key, low=1, high=1)
     strategy.set_key_weight(key, 1)
     strategy.set_episode_end_cond(key, lambda stats, k=key: stats[k] == 1)
     return strategy
@@ -302,21 +508,34 @@ def maze_reward_scenario5(target_path_length=15) -> RewardStrategy:
     
     key = "num_start"
     strategy.set_stats(key)
-    strategy.set_reward_function(key, lambda new_stats, old_stats, k=key: 
-                                 get_range_reward(new_stats[k], 
-                                                  old_stats[k], 
-                                                  low=1, 
-                                                  high=1))
+    strategy.set_range_reward(key, low=1, high=1)
     strategy.set_key_weight(key, 1)
     strategy.set_episode_end_cond(key, lambda stats, k=key: stats[k] == 1)
 
     key = "num_end"
     strategy.set_stats(key)
-    strategy.set_reward_function(key, lambda new_stats, old_stats, k=key: 
-                                 get_range_reward(new_stats[k], 
-                                                  old_stats[k], 
-                                                  low=1, 
-                                                  high=1))
+    strategy.set_range_reward(key, low=1, high=1)
     strategy.set_key_weight(key, 1)
     strategy.set_episode_end_cond(key, lambda stats, k=key: stats[k] == 1)
-    return strategy
\ No newline at end of file
+    return strategy
+
+# Reward strategies that can be selected by name
+REWARD_STRATEGIES = {
+    "maze_reward_scenario3": maze_reward_scenario3,
+    "maze_reward_scenario4": maze_reward_scenario4,
+    "maze_reward_scenario5": maze_reward_scenario5,
+}
+
+"""
+Build a RewardStrategy from its name in REWARD_STRATEGIES or from a
+scenario function, kwargs are passed to the scenario (e.g.
+target_path_length). A RewardStrategy is returned as it is
+"""
+def get_reward_strategy(reward_strategy, **kwargs) -> RewardStrategy:
+    if isinstance(reward_strategy, RewardStrategy):
+        return reward_strategy
+    if isinstance(reward_strategy, str):
+        if reward_strategy not in REWARD_STRATEGIES:
+            raise ValueError(f"Unknown reward strategy: {reward_strategy}")
+        reward_strategy = REWARD_STRATEGIES[reward_strategy]
+    return reward_strategy(**kwargs)
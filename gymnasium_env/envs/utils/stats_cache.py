@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+
+
+"""
+Bounded memo of grid stats
+
+Stats only depend on the grid, so the values computed for a grid can be
+reused whenever the same grid comes back, which is frequent on small maps.
+Entries are keyed by the grid shape and bytes and hold the stats already
+computed for that grid by name (e.g. "path_length"), so strategies using
+different stats can share a cache. When the cache is full the least
+recently used ("lru") or the oldest ("fifo") entry is evicted
+"""
+EVICTION_POLICIES = ["lru", "fifo"]
+
+
+class StatsCache():
+    def __init__(self, max_size: int = 1 << 16, policy: str = "lru"):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.policy = policy
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    @staticmethod
+    def get_key(grid: np.ndarray):
+        return grid.shape, grid.tobytes()
+
+
+    """
+    Stats stored for the grid key, a hit when every stat of keys is
+    stored. The returned dict can be completed and stored back with put
+    """
+    def get(self, key, keys) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if self.policy == "lru":
+            self._entries.move_to_end(key)
+        if all(stat in entry for stat in keys):
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+
+    def put(self, key, entry: dict):
+        if key in self._entries:
+            self._entries[key] = entry
+            return
+        if len(self._entries) >= self.max_size:
+            self._entries.popitem(last=False)
+        self._entries[key] = entry
+
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get_info(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "policy": self.policy,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Caches of this process, one per (max_size, policy)
+_caches = {}
+
+"""
+Cache shared by every env of the process with the same settings,
+worker processes each get their own
+"""
+def get_stats_cache(max_size: int = 1 << 16, policy: str = "lru") -> StatsCache:
+    key = (max_size, policy)
+    if key not in _caches:
+        _caches[key] = StatsCache(max_size, policy)
+    return _caches[key]
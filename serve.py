@@ -0,0 +1,286 @@
+from train import get_algorithm
+from config import RESULTS_PATH, load_run_config
+from gymnasium_env.envs import PcgrlVectorEnv
+
+from collections import deque
+import multiprocessing as mp
+import numpy as np
+import argparse
+import asyncio
+import socket
+import json
+import copy
+import os
+
+
+"""
+Local level generation service
+
+A trained model is loaded once and levels are produced by its rollouts in
+a PcgrlVectorEnv: every env slot is lent to a pending request, and each
+step predicts the actions of all the slots, whatever request they serve,
+with a single model.predict call. Requests are newline-delimited JSON over
+TCP or a Unix socket:
+
+    -> {"num_levels": 4}
+    <- {"levels": [{"grid": [[...], ...], "stats": {...}}, ...]}
+
+Worker processes share the listening socket, each one with its own env
+slots, and the policy weights loaded (in shared memory) by the parent.
+The service only uses the public reset (with a reset_mask) and step of
+the vector env
+"""
+MAX_LEVELS_PER_REQUEST = 1024
+
+
+class _Request():
+    def __init__(self, num_levels: int, future: asyncio.Future):
+        self.num_levels = num_levels
+        self.future = future
+        self.levels = []
+        # Slots currently generating a level for this request
+        self.in_flight = 0
+
+    def needed_slots(self) -> int:
+        return self.num_levels - len(self.levels) - self.in_flight
+
+
+class GenerationService():
+    def __init__(self,
+                 model,
+                 env_kwargs: dict,
+                 num_envs: int = 64,
+                 batch_window: float = 0.005,
+                 deterministic: bool = True,
+                 seed=None):
+        self._model = model
+        self._env = PcgrlVectorEnv(num_envs, **env_kwargs)
+        self._num_envs = num_envs
+        # Time to wait for other requests before stepping an idle service
+        self._batch_window = batch_window
+        self._deterministic = deterministic
+        self._seed = seed
+        self._pending = deque()
+        # Request served by each env slot
+        self._owners = [None] * num_envs
+        self._wakeup = None
+        self.num_steps = 0
+        self.num_levels = 0
+
+
+    async def generate(self, num_levels: int) -> list:
+        if not 0 < num_levels <= MAX_LEVELS_PER_REQUEST:
+            raise ValueError(f"num_levels must be in [1, {MAX_LEVELS_PER_REQUEST}]")
+        request = _Request(num_levels, asyncio.get_running_loop().create_future())
+        self._pending.append(request)
+        self._wakeup.set()
+        return await request.future
+
+
+    def _is_busy(self) -> bool:
+        return bool(self._pending) or any(owner is not None for owner in self._owners)
+
+
+    """
+    Lend the free slots to the pending requests, the slots start a new
+    episode. Returns the new observation, None when no slot was assigned
+    """
+    def _assign_slots(self):
+        assigned = []
+        for slot in range(self._num_envs):
+            while self._pending and self._pending[0].needed_slots() <= 0:
+                self._pending.popleft()
+            if not self._pending:
+                break
+            if self._owners[slot] is None:
+                request = self._pending[0]
+                self._owners[slot] = request
+                request.in_flight += 1
+                assigned.append(slot)
+        if not assigned:
+            return None
+        reset_mask = np.zeros(self._num_envs, dtype=np.bool_)
+        reset_mask[assigned] = True
+        obs, _ = self._env.reset(options={"reset_mask": reset_mask})
+        return obs
+
+
+    def _collect(self, ended, infos):
+        for slot in ended:
+            request = self._owners[slot]
+            if request is None:
+                continue
+            self._owners[slot] = None
+            request.in_flight -= 1
+            if request.future.done():
+                continue
+
+            info = infos["final_info"][slot]
+            request.levels.append({
+                "grid": info["grid"].tolist(),
+                "stats": {key: np.asarray(value).item() for key, value in info.items()
+                          if key != "grid"},
+            })
+            self.num_levels += 1
+            if len(request.levels) == request.num_levels:
+                request.future.set_result(request.levels)
+
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        obs, _ = self._env.reset(seed=self._seed)
+        while True:
+            if not self._is_busy():
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                # Micro-batch the requests arriving together
+                await asyncio.sleep(self._batch_window)
+
+            new_obs = self._assign_slots()
+            if new_obs is not None:
+                obs = new_obs
+            actions, _ = self._model.predict(obs, deterministic=self._deterministic)
+            obs, _, terminated, truncated, infos = self._env.step(actions)
+            self.num_steps += 1
+
+            ended = np.flatnonzero(terminated | truncated)
+            if len(ended) > 0:
+                self._collect(ended, infos)
+            # Let the connections read new requests and send the results
+            await asyncio.sleep(0)
+
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    levels = await self.generate(int(request.get("num_levels", 1)))
+                    response = {"levels": levels}
+                except (ValueError, TypeError, AttributeError) as e:
+                    response = {"error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+    async def serve(self, sock: socket.socket):
+        runner = asyncio.create_task(self.run())
+        if sock.family == socket.AF_UNIX:
+            server = await asyncio.start_unix_server(self.handle_connection, sock=sock)
+        else:
+            server = await asyncio.start_server(self.handle_connection, sock=sock)
+        async with server:
+            await asyncio.gather(server.serve_forever(), runner)
+
+
+def create_socket(host: str = "127.0.0.1", port: int = 8765, unix_path=None) -> socket.socket:
+    if unix_path is not None:
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(unix_path)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+    sock.listen(128)
+    return sock
+
+
+def load_model(log_dir: str, model_file: str = "best_model.zip"):
+    env_kwargs, algorithm = load_run_config(log_dir)
+    env_kwargs = copy.deepcopy(env_kwargs)
+    # The service is headless
+    env_kwargs["env_config"].setdefault("game.config", {})["render_mode"] = None
+    model = get_algorithm(algorithm).load(os.path.join(log_dir, model_file), device="cpu")
+    return model, env_kwargs
+
+
+def _run_worker(policy, env_kwargs, sock, num_envs, batch_window, seed):
+    import torch
+    # Workers share the cores, one inference thread each
+    torch.set_num_threads(1)
+    service = GenerationService(policy, env_kwargs, num_envs, batch_window, seed=seed)
+    asyncio.run(service.serve(sock))
+
+
+"""
+Serve the model of log_dir with num_workers processes. Workers are
+spawned, not forked, as the parent already runs torch. The policy
+weights are moved to shared memory first, so the spawned workers map
+them instead of receiving a copy each
+"""
+def serve(log_dir: str,
+          host: str = "127.0.0.1",
+          port: int = 8765,
+          unix_path=None,
+          num_workers: int = 1,
+          num_envs: int = 64,
+          batch_window: float = 0.005,
+          model_file: str = "best_model.zip",
+          seed=None):
+    model, env_kwargs = load_model(log_dir, model_file)
+    # The policy has the same predict as the model
+    policy = model.policy
+    policy.share_memory()
+    sock = create_socket(host, port, unix_path)
+    print(f"Serving {log_dir} on {unix_path or f'{host}:{port}'} with {num_workers} workers")
+
+    context = mp.get_context("spawn")
+    workers = [context.Process(target=_run_worker,
+                               args=(policy, env_kwargs, sock, num_envs, batch_window,
+                                     None if seed is None else seed + rank),
+                               daemon=True)
+               for rank in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    finally:
+        sock.close()
+        if unix_path is not None and os.path.exists(unix_path):
+            os.unlink(unix_path)
+
+
+# Minimal blocking client
+def request_levels(num_levels: int = 1,
+                   host: str = "127.0.0.1",
+                   port: int = 8765,
+                   unix_path=None) -> list:
+    if unix_path is not None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(unix_path)
+    else:
+        sock = socket.create_connection((host, port))
+    with sock, sock.makefile("rwb") as f:
+        f.write(json.dumps({"num_levels": num_levels}).encode() + b"\n")
+        f.flush()
+        response = json.loads(f.readline())
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["levels"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve levels generated by a trained model")
+    parser.add_argument("model", help=f"model folder in {RESULTS_PATH}")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--num-envs", type=int, default=64, help="env slots per worker")
+    parser.add_argument("--batch-window", type=float, default=0.005,
+                        help="seconds to gather requests before stepping an idle worker")
+    parser.add_argument("--model-file", default="best_model.zip")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    log_dir = args.model if os.path.isdir(args.model) else os.path.join(RESULTS_PATH, args.model)
+    serve(log_dir, args.host, args.port, args.unix, args.workers, args.num_envs,
+          args.batch_window, args.model_file, args.seed)
@@ -0,0 +1,162 @@
+import gymnasium_env
+from config import ENV_PARAMS, ENV_CONFIG, RESULTS_PATH, serialize_env, get_env_kwargs, get_model_name
+from gymnasium_env.envs.utils.dtypes import GenerationType
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+import argparse
+import itertools
+import copy
+import json
+import os
+
+
+"""
+Grid of experiments, every combination of the values is a run.
+Reward scenarios are names in REWARD_STRATEGIES
+"""
+SWEEP = {
+    "representation": ["narrow", "wide"],
+    "reward_scenario": ["maze_reward_scenario3", "maze_reward_scenario4"],
+    "generation": [GenerationType.CUSTOM1, GenerationType.CUSTOM2],
+    "change_rate": [0.1, 0.3],
+    "algorithm": ["ppo"],
+}
+
+# Marker of a finished run, the final model saved by train_model
+FINAL_MODEL = "final_model"
+
+
+def expand_sweep(sweep: dict) -> list:
+    keys = list(sweep)
+    return [dict(zip(keys, values)) for values in itertools.product(*sweep.values())]
+
+
+# Name of the run results folder, the model name with its change rate, e.g. maze-ppo-NRGC2R3-CR30
+def get_run_name(run: dict) -> str:
+    return get_model_name(run["algorithm"], get_env_kwargs(*get_run_env(run)), with_change_rate=True)
+
+
+def is_run_complete(log_dir: str) -> bool:
+    return os.path.exists(os.path.join(log_dir, FINAL_MODEL + ".zip"))
+
+
+# ENV_PARAMS and ENV_CONFIG of a run, based on the ones of config.py
+def get_run_env(run: dict):
+    env_params = copy.deepcopy(ENV_PARAMS)
+    env_config = copy.deepcopy(ENV_CONFIG)
+    env_params["representation"] = run["representation"]
+    env_params["reward_strategy"] = run["reward_scenario"]
+    env_config["representation.config"]["generation"] = GenerationType(run["generation"])
+    env_config["change_rate"] = run["change_rate"]
+    # Training is headless
+    env_config["game.config"]["render_mode"] = None
+    return env_params, env_config
+
+
+def save_run_config(log_dir: str, run: dict, train_params: dict):
+    env_params, env_config = get_run_env(run)
+    serializable_params, serializable_config = serialize_env(env_params, env_config)
+    with open(os.path.join(log_dir, "env_params.json"), "w") as f:
+        json.dump(serializable_params, f, indent=2)
+    with open(os.path.join(log_dir, "env_config.json"), "w") as f:
+        json.dump(serializable_config, f, indent=2)
+    with open(os.path.join(log_dir, "train_params.json"), "w") as f:
+        json.dump({"algorithm": run["algorithm"], **train_params}, f, indent=2)
+
+
+"""
+Pool workers take one group of cores from the queue and pin themselves
+(and the env workers they start) to it
+"""
+def _init_worker(core_groups):
+    cores = core_groups.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+
+def run_experiment(run: dict, results_path: str, train_params: dict) -> str:
+    # Imported in the pool worker so torch starts after the pinning
+    from train import train_model
+
+    log_dir = os.path.join(results_path, get_run_name(run))
+    os.makedirs(log_dir, exist_ok=True)
+    save_run_config(log_dir, run, train_params)
+
+    env_params, env_config = get_run_env(run)
+    train_model(model_name=os.path.join(log_dir, FINAL_MODEL),
+                algorithm=run["algorithm"],
+                env_kwargs=get_env_kwargs(env_params, env_config),
+                log_dir=log_dir,
+                **train_params)
+    return log_dir
+
+
+"""
+Run every combination of the sweep not completed yet in results_path,
+num_parallel runs at a time, each one limited to cpus_per_run cores
+"""
+def run_sweep(sweep: dict = SWEEP,
+              results_path: str = RESULTS_PATH,
+              num_parallel=None,
+              cpus_per_run: int = 1,
+              start_method=None,
+              **train_params):
+    runs = expand_sweep(sweep)
+    pending = [run for run in runs
+               if not is_run_complete(os.path.join(results_path, get_run_name(run)))]
+    print(f"{len(runs) - len(pending)} of {len(runs)} runs already complete")
+    if not pending:
+        return []
+
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") \
+        else list(range(os.cpu_count() or 1))
+    cpus_per_run = max(min(cpus_per_run, len(cores)), 1)
+    max_parallel = max(len(cores) // cpus_per_run, 1)
+    num_parallel = min(num_parallel or max_parallel, max_parallel, len(pending))
+
+    context = mp.get_context(start_method)
+    core_groups = context.Queue()
+    for i in range(num_parallel):
+        core_groups.put(set(cores[i * cpus_per_run:(i + 1) * cpus_per_run]))
+    # One env worker per core of the run and as many learner threads
+    train_params = {"num_envs": cpus_per_run, "num_threads": cpus_per_run,
+                    "start_method": start_method, **train_params}
+
+    completed = []
+    with ProcessPoolExecutor(max_workers=num_parallel,
+                             mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(core_groups,)) as executor:
+        futures = {executor.submit(run_experiment, run, results_path, train_params): run
+                   for run in pending}
+        for future in as_completed(futures):
+            name = get_run_name(futures[future])
+            try:
+                completed.append(future.result())
+                print(f"Run {name} finished")
+            except Exception as e:
+                print(f"Run {name} failed: {e!r}")
+    return completed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train every combination of the sweep")
+    parser.add_argument("--results-path", default=RESULTS_PATH)
+    parser.add_argument("--num-parallel", type=int, default=None,
+                        help="concurrent runs, defaults to the available cores / cpus-per-run")
+    parser.add_argument("--cpus-per-run", type=int, default=1)
+    parser.add_argument("--start-method", choices=["fork", "spawn", "forkserver"], default=None)
+    parser.add_argument("--timesteps", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_sweep(results_path=args.results_path,
+              num_parallel=args.num_parallel,
+              cpus_per_run=args.cpus_per_run,
+              start_method=args.start_method,
+              total_timesteps=args.timesteps,
+              seed=args.seed)
@@ -1,64 +1,162 @@
-from train import MODEL_NAME, LOG_DIR
+from train import MODEL_NAME, get_algorithm
+from config import RESULTS_PATH, load_run_config
+from gymnasium_env.envs import PcgrlVectorEnv
+from gymnasium_env.envs.utils.rewards import RewardStrategy, TILE_COUNT_STATS, PATH_STATS
 
 
-import gymnasium as gym
 import numpy as np
-import pandas as pd
+import argparse
+import copy
+import json
 import time
-import os 
-
-from stable_baselines3 import DQN, PPO
-from stable_baselines3.common.monitor import Monitor
-
-SAVE_DIR = './results/test/'
-os.makedirs(SAVE_DIR, exist_ok=True)
-
-SAVE_FILE = os.path.join(SAVE_DIR, MODEL_NAME)
-env = gym.make("Maze-v0", render_mode="human")
-print(f'Model name: f{MODEL_NAME}')
-print(LOG_DIR)
-model = PPO.load(os.path.join(LOG_DIR, "best_model.zip"))
-obs, info = env.reset()
-total_term = 0
-total_trunc = 0
-
-# Coletar dados de teste
-test_data = []
-episode_reward = 0
-episode_length = 0
-episode_id = 0
-
-test_length = 1_000
-print(f'Starting testing loop')
-while episode_id < test_length:
-    env.render()  
-    action, _states = model.predict(obs, deterministic=True)
-    obs, reward, terminated, truncated, info = env.step(action)
-    
-    episode_reward += reward
-    episode_length += 1
-
-    if terminated or truncated:
-        test_data.append({
-            "episode": episode_id,
-            "reward_total": episode_reward,
-            "length": episode_length,
-            "terminated": terminated,
-            "truncated": truncated,
-            **info  # Se info contiver dados úteis como path_length, etc.
-        })
-
-        total_term += int(terminated)
-        total_trunc += int(truncated)
-
-        obs, info = env.reset()
-        episode_reward = 0
-        episode_length = 0
-        episode_id += 1
-    if episode_id % 100 == 0:
-        print(f' Episode: {episode_id}')
-# Salvar os dados
-df = pd.DataFrame(test_data)
-df.to_csv(os.path.join(SAVE_DIR, MODEL_NAME+"test_metrics.csv"), index=False)
-
-print("Dados de teste salvos em test_metrics.csv")
\ No newline at end of file
+import csv
+import os
+
+
+"""
+Headless batch evaluation of trained models
+
+Episodes run num_envs at a time in a PcgrlVectorEnv, which steps all of
+them with numpy in this process (no worker processes), and the actions of
+all of them come from a single model.predict call. Every seed of the list
+starts a round of num_envs episodes, so the same seeds always evaluate the
+same levels. Each finished episode is appended as a row to
+eval_episodes.csv and a summary is saved in eval_summary.json, both in the
+model results folder
+"""
+EVAL_STATS = list(TILE_COUNT_STATS) + list(PATH_STATS)
+ROW_FIELDS = ["episode", "seed", "env", "reward_total", "length", "terminated",
+              "truncated", "changes", "max_changes"] + EVAL_STATS
+
+
+def get_stats_strategy() -> RewardStrategy:
+    strategy = RewardStrategy()
+    for key in EVAL_STATS:
+        strategy.set_stats(key)
+    return strategy
+
+
+"""
+Run a round of env.num_envs episodes per seed, writing each finished
+episode to writer, returns all the rows
+"""
+def evaluate_model(model, env: PcgrlVectorEnv, seeds, writer=None, render=False) -> list:
+    strategy = get_stats_strategy()
+    rows = []
+    for seed in seeds:
+        obs, _ = env.reset(seed=seed)
+        active = np.ones(env.num_envs, dtype=np.bool_)
+        rewards = np.zeros(env.num_envs, dtype=np.float64)
+        lengths = np.zeros(env.num_envs, dtype=np.int64)
+        while active.any():
+            if render:
+                env.render()
+            actions, _ = model.predict(obs, deterministic=True)
+            obs, reward, terminated, truncated, infos = env.step(actions)
+            rewards += reward * active
+            lengths += active
+
+            ended = np.flatnonzero(active & (terminated | truncated))
+            if len(ended) == 0:
+                continue
+            active[ended] = False
+            final_info = [infos["final_info"][i] for i in ended]
+            stats = strategy.compute_stats_batch(np.stack([info["grid"] for info in final_info]))
+            for j, i in enumerate(ended):
+                row = {
+                    "episode": len(rows),
+                    "seed": seed,
+                    "env": int(i),
+                    "reward_total": float(rewards[i]),
+                    "length": int(lengths[i]),
+                    "terminated": bool(terminated[i]),
+                    "truncated": bool(truncated[i]),
+                    "changes": int(final_info[j]["changes"]),
+                    "max_changes": int(final_info[j]["max_changes"]),
+                    **{key: stats[key][j].item() for key in EVAL_STATS},
+                }
+                rows.append(row)
+                if writer is not None:
+                    writer.writerow(row)
+    return rows
+
+
+def summarize(rows: list) -> dict:
+    solvable = np.array([row["is_grid_solvable"] for row in rows], dtype=np.bool_)
+    path_length = np.array([row["path_length"] for row in rows], dtype=np.int64)[solvable]
+    changes = np.array([row["changes"] for row in rows], dtype=np.float64)
+    max_changes = np.array([row["max_changes"] for row in rows], dtype=np.float64)
+    summary = {
+        "episodes": len(rows),
+        "solvable_rate": float(solvable.mean()),
+        "terminated_rate": float(np.mean([row["terminated"] for row in rows])),
+        "mean_reward": float(np.mean([row["reward_total"] for row in rows])),
+        "mean_length": float(np.mean([row["length"] for row in rows])),
+        "mean_changes": float(changes.mean()),
+        "mean_changes_used": float((changes / max_changes).mean()),
+        "path_length": None,
+    }
+    if len(path_length) > 0:
+        lengths, counts = np.unique(path_length, return_counts=True)
+        summary["path_length"] = {
+            "mean": float(path_length.mean()),
+            "std": float(path_length.std()),
+            "min": int(path_length.min()),
+            "max": int(path_length.max()),
+            "percentiles": {str(q): float(np.percentile(path_length, q)) for q in (25, 50, 75)},
+            "histogram": {str(length): int(count) for length, count in zip(lengths, counts)},
+        }
+    return summary
+
+
+def evaluate(log_dir: str,
+             seeds,
+             num_envs: int = 64,
+             model_file: str = "best_model.zip",
+             render: bool = False) -> dict:
+    env_kwargs, algorithm = load_run_config(log_dir)
+    env_kwargs = copy.deepcopy(env_kwargs)
+    # Headless unless rendering was requested
+    env_kwargs["env_config"].setdefault("game.config", {})["render_mode"] = "human" if render else None
+    env = PcgrlVectorEnv(num_envs, **env_kwargs)
+    model = get_algorithm(algorithm).load(os.path.join(log_dir, model_file), device="cpu")
+
+    start_time = time.time()
+    with open(os.path.join(log_dir, "eval_episodes.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=ROW_FIELDS)
+        writer.writeheader()
+        try:
+            rows = evaluate_model(model, env, seeds, writer, render)
+        finally:
+            env.close()
+
+    summary = {"model": os.path.join(log_dir, model_file),
+               "seeds": list(seeds),
+               "num_envs": num_envs,
+               "duration": time.time() - start_time,
+               **summarize(rows)}
+    with open(os.path.join(log_dir, "eval_summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate trained models")
+    parser.add_argument("models", nargs="*", default=[MODEL_NAME],
+                        help=f"model folders in {RESULTS_PATH}")
+    parser.add_argument("--num-envs", type=int, default=64)
+    parser.add_argument("--seeds", type=int, nargs="+", default=list(range(16)),
+                        help="one round of num-envs episodes per seed")
+    parser.add_argument("--model-file", default="best_model.zip")
+    parser.add_argument("--render", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    for name in args.models:
+        log_dir = name if os.path.isdir(name) else os.path.join(RESULTS_PATH, name)
+        print(f'Model name: {name}')
+        summary = evaluate(log_dir, args.seeds, args.num_envs, args.model_file, args.render)
+        print(f"{summary['episodes']} episodes, solvable: {summary['solvable_rate']:.2%}, "
+              f"mean changes used: {summary['mean_changes_used']:.2%}")
@@ -0,0 +1,54 @@
+from gymnasium_env.envs import PcgrlEnv
+from gymnasium_env.envs.utils.dtypes import TileType
+
+import numpy as np
+import pytest
+
+
+"""
+PcgrlEnv keyword arguments without rendering, size sets both the height
+and the width of the grid and the remaining keywords go to env_config
+"""
+def get_env_kwargs(representation: str = "narrow",
+                   size: int = None,
+                   representation_config: dict = None,
+                   reward_strategy: str = None,
+                   **env_config) -> dict:
+    game_config = {"render_mode": None}
+    if size is not None:
+        game_config.update(height=size, width=size)
+    env_config["game.config"] = game_config
+    if representation_config is not None:
+        env_config["representation.config"] = representation_config
+    kwargs = {"representation": representation, "env_config": env_config}
+    if reward_strategy is not None:
+        kwargs["reward_strategy"] = reward_strategy
+    return kwargs
+
+
+@pytest.fixture
+def env_kwargs():
+    return get_env_kwargs
+
+
+@pytest.fixture
+def make_env():
+    return lambda *args, **kwargs: PcgrlEnv(**get_env_kwargs(*args, **kwargs))
+
+
+"""
+Random grids with shape (N, H, W), walls drawn with wall_prob and a
+single START and END on two distinct random cells of each grid
+"""
+def get_random_grids(rng, num_grids: int, height: int, width: int, wall_prob: float = 0.35) -> np.ndarray:
+    grids = np.where(rng.random((num_grids, height, width)) < wall_prob,
+                     TileType.WALL, TileType.EMPTY).astype(np.uint8)
+    for grid in grids:
+        start, end = rng.choice(height * width, size=2, replace=False)
+        grid.flat[start], grid.flat[end] = TileType.START, TileType.END
+    return grids
+
+
+@pytest.fixture
+def random_grids():
+    return get_random_grids
@@ -0,0 +1,16 @@
+from config import get_env_kwargs, get_model_name
+from gymnasium_env.envs.utils.rewards import RewardStrategy, maze_reward_scenario4
+
+import pytest
+
+
+def test_model_name_of_reward_strategy():
+    kwargs = get_env_kwargs()
+    assert get_model_name("ppo", kwargs) == "maze-ppo-NRGC2R3"
+
+    kwargs["reward_strategy"] = maze_reward_scenario4
+    assert get_model_name("ppo", kwargs) == "maze-ppo-NRGC2R4"
+
+    kwargs["reward_strategy"] = RewardStrategy()
+    with pytest.raises(ValueError, match="reward strategy"):
+        get_model_name("ppo", kwargs)
@@ -0,0 +1,46 @@
+from gymnasium_env.envs.utils import corpus as corpus_module
+from gymnasium_env.envs.utils.corpus import LevelCorpus
+from gymnasium_env.envs.utils.generation import generate
+from gymnasium_env.envs.utils.dtypes import GenerationType
+
+import numpy as np
+
+
+def test_add_and_query(tmp_path):
+    grids = generate(GenerationType.CUSTOM2, 7, 5, np.random.default_rng(0), 50)
+    with LevelCorpus(str(tmp_path / "corpus"), 7, 5, shard_size=16) as corpus:
+        indices, added = corpus.add(np.concatenate([grids, grids]))
+        assert len(corpus) == added.sum() <= 50
+        assert np.array_equal(corpus.get_grids(indices), np.concatenate([grids, grids]))
+
+        solvable = corpus.query(is_grid_solvable=True)
+        assert corpus.get_stats(solvable)["is_grid_solvable"].all()
+
+
+def test_empty_query(tmp_path):
+    grids = generate(GenerationType.CUSTOM2, 6, 6, np.random.default_rng(0), 8)
+    with LevelCorpus(str(tmp_path / "corpus"), 6, 6) as corpus:
+        corpus.add(grids)
+        indices = corpus.query(path_length=(1000, 2000))
+        assert len(indices) == 0
+        assert corpus.get_grids(indices).shape == (0, 6, 6)
+        assert len(corpus.get_stats(indices)) == 0
+
+
+def test_hash_collisions_keep_different_grids(tmp_path, monkeypatch):
+    # Every grid gets the same hash, only the packed bytes tell them apart
+    monkeypatch.setattr(corpus_module, "hash_packed_grids",
+                        lambda packed: np.zeros(len(packed), dtype=np.uint64))
+    grids = generate(GenerationType.CUSTOM2, 6, 6, np.random.default_rng(1), 20)
+    unique = np.unique(grids, axis=0)
+    path = str(tmp_path / "corpus")
+    with LevelCorpus(path, 6, 6, shard_size=8) as corpus:
+        indices, added = corpus.add(np.concatenate([grids[:10], grids]))
+        assert len(corpus) == added.sum() == len(unique)
+        assert np.array_equal(corpus.get_grids(indices), np.concatenate([grids[:10], grids]))
+
+    with LevelCorpus(path) as corpus:
+        assert all(corpus.contains(grid) for grid in grids)
+        assert not corpus.contains(np.zeros((6, 6), dtype=grids.dtype))
+        _, added = corpus.add(grids)
+        assert not added.any()
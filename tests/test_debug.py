@@ -0,0 +1,54 @@
+from gymnasium_env.envs.utils.debug import LOGGER_NAME, is_debug_enabled, set_debug
+
+import logging
+import pytest
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+# Debug messages of the package logger and of the per env debug logger
+@pytest.fixture
+def messages():
+    handler = ListHandler()
+    loggers = [logging.getLogger(LOGGER_NAME), logging.getLogger(LOGGER_NAME + ".debug")]
+    for logger in loggers:
+        logger.addHandler(handler)
+    yield handler.messages
+    for logger in loggers:
+        logger.removeHandler(handler)
+
+
+def run_episode_start(env):
+    env.reset(seed=0)
+    env.step(1)
+
+
+def test_debug_is_per_env(messages, make_env):
+    run_episode_start(make_env(debug=None))
+    assert messages == []
+
+    debug_env = make_env(debug=True)
+    run_episode_start(debug_env)
+    assert debug_env._debug
+    assert not is_debug_enabled()
+    assert any(message.startswith("Reward ") for message in messages)
+    assert any(message.startswith("Final reward") for message in messages)
+
+
+def test_disabled_env_ignores_package_debug(messages, make_env):
+    set_debug(True)
+    try:
+        run_episode_start(make_env(debug=False))
+        assert messages == []
+
+        run_episode_start(make_env(debug=None))
+        assert any(message.startswith("Reward ") for message in messages)
+    finally:
+        set_debug(False)
@@ -0,0 +1,41 @@
+from gymnasium_env.envs.utils.generation import generate
+from gymnasium_env.envs.utils.helper import get_tile_counts_batch, is_maze_solvable_batch
+from gymnasium_env.envs.utils.dtypes import GenerationType, TileType
+
+import numpy as np
+import pytest
+
+
+ENDPOINT_GENERATIONS = [GenerationType.DFS, GenerationType.CUSTOM1, GenerationType.CUSTOM2]
+
+
+SMALL_SIZES = [(1, 3), (2, 3), (3, 2), (3, 3), (4, 4), (5, 7)]
+
+
+@pytest.mark.parametrize("gen_type, height, width",
+                         [(gen_type, *size) for gen_type in ENDPOINT_GENERATIONS for size in SMALL_SIZES] +
+                         [(gen_type, *size) for gen_type in ENDPOINT_GENERATIONS[1:] for size in [(1, 2), (2, 1)]])
+def test_small_grids_are_solvable(gen_type, height, width):
+    grids = generate(gen_type, height, width, np.random.default_rng(0), 20)
+    counts = get_tile_counts_batch(grids)
+    assert (counts[:, TileType.START] == 1).all()
+    assert (counts[:, TileType.END] == 1).all()
+    assert is_maze_solvable_batch(grids)[0].all()
+
+
+@pytest.mark.parametrize("gen_type", ENDPOINT_GENERATIONS)
+@pytest.mark.parametrize("num_grids", [None, 4])
+def test_single_cell_grids_are_rejected(gen_type, num_grids):
+    with pytest.raises(ValueError, match="START and END need 2"):
+        generate(gen_type, 1, 1, np.random.default_rng(0), num_grids)
+
+
+@pytest.mark.parametrize("height, width", [(1, 2), (2, 2)])
+def test_single_cell_dfs_mazes_are_rejected(height, width):
+    with pytest.raises(ValueError, match="maze cells"):
+        generate(GenerationType.DFS, height, width, np.random.default_rng(0))
+
+
+def test_seeded_generation_is_reproducible():
+    grids = [generate(GenerationType.DFS, 9, 9, np.random.default_rng(1), 8) for _ in range(2)]
+    assert np.array_equal(*grids)
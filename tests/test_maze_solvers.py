@@ -0,0 +1,35 @@
+from gymnasium_env.envs.utils import helper
+from gymnasium_env.envs.utils.helper import MAZE_SOLVERS, is_maze_solvable, set_maze_solver
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def restore_solver():
+    solver = helper._maze_solver
+    yield
+    helper._maze_solver = solver
+
+
+@pytest.mark.parametrize("shape", [(5, 5), (7, 12), (1, 10), (10, 1), (2, 2), (16, 16)])
+@pytest.mark.parametrize("wall_prob", [0.0, 0.3, 0.5])
+def test_solvers_agree(random_grids, shape, wall_prob):
+    rng = np.random.default_rng(sum(shape))
+    for grid in random_grids(rng, 30, *shape, wall_prob=wall_prob):
+        results = {name: solve(grid) for name, solve in MAZE_SOLVERS.items()}
+        expected = results.pop("deque")
+        for name, (solvable, path_length) in results.items():
+            assert (bool(solvable), int(path_length)) == (bool(expected[0]), int(expected[1])), name
+
+
+def test_selected_solver_is_used(random_grids, restore_solver):
+    grids = random_grids(np.random.default_rng(0), 30, 8, 8)
+    results = []
+    for name in MAZE_SOLVERS:
+        set_maze_solver(name)
+        results.append([tuple(map(int, is_maze_solvable(grid))) for grid in grids])
+    assert all(result == results[0] for result in results)
+
+    with pytest.raises(ValueError, match="Unknown maze solver"):
+        set_maze_solver("dfs")
@@ -0,0 +1,59 @@
+from gymnasium_env.envs import PcgrlEnv, PcgrlVectorEnv
+
+import numpy as np
+import copy
+import pytest
+
+
+@pytest.mark.parametrize("size, change_rate", [(32, 0.3), (64, 0.2)])
+@pytest.mark.parametrize("representation_config", [{}, {"crop_size": 21}])
+def test_large_map_construction(make_env, size, change_rate, representation_config):
+    env = make_env(size=size, representation_config=representation_config, change_rate=change_rate)
+    assert env._max_changes > 255
+    assert env.observation_space["heatmap"].high.max() == 255
+    obs, _ = env.reset(seed=0)
+    assert env.observation_space.contains(obs)
+
+
+def test_heatmap_saturates(env_kwargs):
+    kwargs = env_kwargs("wide", 64, change_rate=0.2)
+    env = PcgrlEnv(**kwargs)
+    env.reset(seed=0)
+    for _ in range(300):
+        env.step((0, 0, 1))
+        env.step((0, 0, 0))
+    assert env._heatmap[0, 0] == 255
+
+    vector_env = PcgrlVectorEnv(2, **kwargs)
+    vector_env.reset(seed=0)
+    for _ in range(300):
+        vector_env.step(np.array([[0, 0, 1], [1, 1, 1]]))
+        obs = vector_env.step(np.array([[0, 0, 0], [1, 1, 1]]))[0]
+    assert obs["heatmap"][0, 0, 0] == 255
+    vector_env.close()
+
+
+@pytest.mark.parametrize("crop_size", [0, -3, 4, 20, 2.5])
+def test_invalid_crop_size(make_env, crop_size):
+    with pytest.raises(ValueError, match="crop_size"):
+        make_env(size=8, representation_config={"crop_size": crop_size}, change_rate=0.2)
+
+
+@pytest.mark.parametrize("layout", ["dict", "flat", "packed"])
+@pytest.mark.parametrize("representation_config", [{}, {"crop_size": 5}])
+def test_terminal_observation_survives_reset(make_env, layout, representation_config):
+    env = make_env(size=6, representation_config=representation_config, change_rate=0.3,
+                   copy_observations=False, observation=layout)
+    env.reset(seed=0)
+    done = False
+    while not done:
+        obs, _, terminated, truncated, _ = env.step(env.action_space.sample())
+        done = terminated or truncated
+    # As DummyVecEnv, keep the terminal observation and reset right away
+    saved = copy.deepcopy(obs)
+    env.reset()
+    if layout == "dict":
+        for key in saved:
+            assert np.array_equal(obs[key], saved[key])
+    else:
+        assert np.array_equal(obs, saved)
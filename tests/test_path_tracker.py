@@ -0,0 +1,47 @@
+from gymnasium_env.envs.utils.dtypes import TileType
+from gymnasium_env.envs.utils.helper import is_maze_solvable
+from gymnasium_env.envs.utils.path_tracker import PathTracker
+
+import numpy as np
+import pytest
+
+
+# Mostly walls added and removed, sometimes START or END moved or duplicated
+EDIT_TILES = [TileType.EMPTY, TileType.WALL, TileType.START, TileType.END]
+EDIT_PROBS = [0.45, 0.45, 0.05, 0.05]
+
+
+def random_edit(rng, grid):
+    y, x = rng.integers(grid.shape[0]), rng.integers(grid.shape[1])
+    old_tile, new_tile = grid[y, x], rng.choice(EDIT_TILES, p=EDIT_PROBS)
+    grid[y, x] = new_tile
+    return x, y, old_tile, new_tile
+
+
+def full_bfs(grid):
+    solvable, path_length = is_maze_solvable(grid)
+    return bool(solvable), int(path_length)
+
+
+@pytest.mark.parametrize("seed, shape", [(0, (6, 6)), (1, (8, 5)), (2, (1, 9)), (3, (12, 12))])
+def test_updates_match_full_bfs(random_grids, seed, shape):
+    rng = np.random.default_rng(seed)
+    for grid in random_grids(rng, 5, *shape):
+        tracker = PathTracker()
+        assert tracker.reset(grid) == full_bfs(grid)
+        for _ in range(200):
+            tracker.update(*random_edit(rng, grid))
+            assert tracker.get_path() == full_bfs(grid)
+
+
+@pytest.mark.parametrize("seed", [4, 5])
+def test_deferred_edits_match_full_bfs(random_grids, seed):
+    rng = np.random.default_rng(seed)
+    for grid in random_grids(rng, 5, 7, 7):
+        tracker = PathTracker()
+        tracker.reset(grid, lazy=rng.random() < 0.5)
+        for _ in range(100):
+            # Zero, one (incremental) or several (recompute) edits per sync
+            for _ in range(rng.integers(4)):
+                tracker.defer(*random_edit(rng, grid))
+            assert tracker.sync() == full_bfs(grid)
@@ -0,0 +1,54 @@
+from gymnasium_env.envs.utils.dtypes import TileType
+from gymnasium_env.envs.utils.helper import get_num_regions, get_num_regions_batch, label_regions, label_regions_batch
+
+from collections import deque
+import numpy as np
+import pytest
+
+
+# Reference labeling, regions numbered by their first cell in row-major order
+def flood_fill_regions(grid):
+    rows, cols = grid.shape
+    regions = np.full(grid.shape, -1, dtype=np.intp)
+    sizes = []
+    for r in range(rows):
+        for c in range(cols):
+            if grid[r, c] == TileType.WALL or regions[r, c] >= 0:
+                continue
+            regions[r, c] = len(sizes)
+            queue, size = deque([(r, c)]), 0
+            while queue:
+                y, x = queue.popleft()
+                size += 1
+                for ny, nx in ((y + 1, x), (y - 1, x), (y, x + 1), (y, x - 1)):
+                    if 0 <= ny < rows and 0 <= nx < cols \
+                            and grid[ny, nx] != TileType.WALL and regions[ny, nx] < 0:
+                        regions[ny, nx] = len(sizes)
+                        queue.append((ny, nx))
+            sizes.append(size)
+    return regions, np.array(sizes, dtype=np.intp)
+
+
+@pytest.mark.parametrize("shape", [(6, 6), (9, 4), (1, 12), (12, 1), (16, 16)])
+@pytest.mark.parametrize("wall_prob", [0.0, 0.4, 0.6, 1.0])
+def test_regions_match_flood_fill(random_grids, shape, wall_prob):
+    grids = random_grids(np.random.default_rng(sum(shape)), 20, *shape, wall_prob=wall_prob)
+    if wall_prob == 1.0:
+        grids[:] = TileType.WALL
+    regions, num_regions, sizes = label_regions_batch(grids)
+    assert np.array_equal(num_regions, get_num_regions_batch(grids))
+    for i, grid in enumerate(grids):
+        expected_regions, expected_sizes = flood_fill_regions(grid)
+        assert np.array_equal(regions[i], expected_regions)
+        assert np.array_equal(sizes[i], expected_sizes)
+        assert num_regions[i] == len(expected_sizes) == get_num_regions(grid)
+
+        single_regions, single_sizes = label_regions(grid)
+        assert np.array_equal(single_regions, expected_regions)
+        assert np.array_equal(single_sizes, expected_sizes)
+
+
+def test_empty_batch():
+    regions, num_regions, sizes = label_regions_batch(np.zeros((0, 5, 5), dtype=np.uint8))
+    assert regions.shape == (0, 5, 5)
+    assert len(num_regions) == 0 and sizes == []
@@ -0,0 +1,46 @@
+from gymnasium_env.envs.utils.dtypes import TileType
+from gymnasium_env.envs.utils.rewards import POSSIBLE_MAZE_REWARDS, REWARD_STRATEGIES, RewardStrategy
+from gymnasium_env.envs.utils.stats_cache import StatsCache
+
+import numpy as np
+import pytest
+
+
+def get_all_stats_strategy():
+    strategy = RewardStrategy()
+    for key in POSSIBLE_MAZE_REWARDS:
+        strategy.set_stats(key)
+    return strategy
+
+
+# Random grids where some tiles are also turned into extra START and END tiles
+def get_grids(random_grids, seed, shape):
+    rng = np.random.default_rng(seed)
+    grids = random_grids(rng, 40, *shape)
+    endpoints = rng.random(grids.shape) < 0.02
+    grids[endpoints] = rng.choice([TileType.START, TileType.END], size=endpoints.sum())
+    return grids
+
+
+def assert_batch_matches(strategy, grids):
+    batch = strategy.compute_stats_batch(grids)
+    assert set(batch) == set(strategy.stats_dict)
+    for i, grid in enumerate(grids):
+        stats = strategy.compute_stats(grid)
+        assert {key: batch[key][i] for key in stats} == stats
+
+
+@pytest.mark.parametrize("seed, shape", [(0, (6, 6)), (1, (9, 4)), (2, (1, 8)), (3, (14, 14))])
+def test_batch_stats_match_single_grid(random_grids, seed, shape):
+    assert_batch_matches(get_all_stats_strategy(), get_grids(random_grids, seed, shape))
+
+
+@pytest.mark.parametrize("name", list(REWARD_STRATEGIES))
+def test_batch_stats_match_single_grid_with_cache(random_grids, name):
+    grids = get_grids(random_grids, 4, (7, 7))
+    strategy = REWARD_STRATEGIES[name]()
+    strategy.set_stats_cache(StatsCache(max_size=64))
+    # Part of the grids already cached, then all of them
+    strategy.compute_stats_batch(grids[::3])
+    assert_batch_matches(strategy, grids)
+    assert_batch_matches(strategy, grids)
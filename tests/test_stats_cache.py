@@ -0,0 +1,77 @@
+from gymnasium_env.envs.utils.dtypes import TileType
+from gymnasium_env.envs.utils.path_tracker import PathTracker
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def make_cache_env(make_env):
+    return lambda stats_cache: make_env("wide", 8, {"generation": "CUSTOM2"},
+                                        stats_cache=stats_cache, path_tracker=True)
+
+
+def count_bfs(monkeypatch):
+    calls = []
+    bfs = PathTracker._bfs
+    monkeypatch.setattr(PathTracker, "_bfs", lambda self, source: calls.append(source) or bfs(self, source))
+    return calls
+
+
+# Toggling a tile back and forth revisits the same two grids
+def toggle_tile(env, x, y, num_toggles):
+    stats = []
+    for _ in range(num_toggles):
+        stats.append(env.step((x, y, 1))[4])
+        stats.append(env.step((x, y, 0))[4])
+    return stats
+
+
+# A single corridor from START to END, any wall in it cuts the path
+def get_corridor_env(make_cache_env, stats_cache):
+    env = make_cache_env(stats_cache)
+    env.reset(seed=3)
+    grid = env._representation._grid
+    grid[:] = TileType.WALL
+    grid[3] = TileType.EMPTY
+    grid[3, 0], grid[3, -1] = TileType.START, TileType.END
+    env._stats = env._reward.compute_stats(grid, env._path_tracker.reset(grid))
+    return env
+
+
+def test_cache_hits_skip_bfs(monkeypatch, make_cache_env):
+    calls = count_bfs(monkeypatch)
+    env = get_corridor_env(make_cache_env, stats_cache=None)
+    del calls[:]
+    # Without the cache every toggle is two full recomputes of two BFS
+    stats = toggle_tile(env, 3, 3, 10)
+    assert len(calls) == 40
+    assert [info["path_length"] for info in stats[:2]] == [-1, 7]
+
+    env = get_corridor_env(make_cache_env, stats_cache={"max_size": 128})
+    env._reward.get_stats_cache().clear()
+    env._reward.compute_stats(env._representation._grid)
+    del calls[:]
+    # Only the first walled grid is computed, the 19 other grids are cache hits
+    cached_stats = toggle_tile(env, 3, 3, 10)
+    assert len(calls) == 2
+    assert env._reward.get_stats_cache().hits == 19
+    assert cached_stats == stats
+
+    # The next miss resyncs the tracker, the edits it skipped are a full recompute
+    info = env.step((4, 3, 1))[4]
+    assert len(calls) == 4
+    assert info["path_length"] == -1
+    info = env.step((4, 3, 0))[4]
+    assert info["path_length"] == 7
+
+
+def test_cached_stats_match_uncached(make_cache_env):
+    envs = [make_cache_env(stats_cache=None), make_cache_env(stats_cache={"max_size": 64})]
+    for env in envs:
+        env.reset(seed=7)
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        action = (rng.integers(8), rng.integers(8), rng.integers(2))
+        infos = [env.step(action)[4] for env in envs]
+        assert infos[0] == infos[1]
@@ -0,0 +1,61 @@
+from gymnasium_env.envs import PcgrlVectorEnv
+
+import numpy as np
+import pytest
+
+
+def test_failed_init_keeps_its_error():
+    # close_extras runs from __del__ without the template env
+    with pytest.raises(ValueError, match="Unknown reward strategy"):
+        PcgrlVectorEnv(2, reward_strategy="missing_scenario")
+
+
+def assert_obs_equal(obs, expected):
+    if isinstance(expected, dict):
+        assert obs.keys() == expected.keys()
+        for key in expected:
+            assert np.array_equal(obs[key], expected[key]), key
+    else:
+        assert np.array_equal(obs, expected)
+
+
+# Observation of the sub-environment i
+def get_obs(obs, i):
+    if isinstance(obs, dict):
+        return {key: value[i] for key, value in obs.items()}
+    return obs[i]
+
+
+# Deterministic levels and cursors, so both sides see the same episodes
+@pytest.mark.parametrize("representation", ["narrow", "wide", "turtle"])
+@pytest.mark.parametrize("layout", ["dict", "flat"])
+@pytest.mark.parametrize("copy_observations", [True, False])
+def test_matches_independent_envs(env_kwargs, make_env, representation, layout, copy_observations):
+    num_envs = 3
+    config = dict(change_rate=0.4, observation=layout, copy_observations=copy_observations)
+    representation_config = {"generation": "CUSTOM1", "random_start": False}
+    vector_env = PcgrlVectorEnv(num_envs, **env_kwargs(representation, 5, representation_config, **config))
+    envs = [make_env(representation, 5, representation_config, **config) for _ in range(num_envs)]
+
+    obs, _ = vector_env.reset(seed=0)
+    for i, env in enumerate(envs):
+        assert_obs_equal(get_obs(obs, i), env.reset(seed=i)[0])
+
+    vector_env.action_space.seed(0)
+    num_episodes = 0
+    for _ in range(300):
+        actions = vector_env.action_space.sample()
+        obs, rewards, terminations, truncations, infos = vector_env.step(actions)
+        for i, env in enumerate(envs):
+            action = tuple(actions[i]) if representation == "wide" else int(actions[i])
+            env_obs, reward, terminated, truncated, info = env.step(action)
+            assert reward == pytest.approx(rewards[i])
+            assert (terminated, truncated) == (terminations[i], truncations[i])
+            if terminated or truncated:
+                num_episodes += 1
+                assert_obs_equal(infos["final_obs"][i], env_obs)
+                assert infos["final_info"][i]["path_length"] == info["path_length"]
+                env_obs = env.reset()[0]
+            assert_obs_equal(get_obs(obs, i), env_obs)
+    assert num_episodes > 0
+    vector_env.close()
@@ -1,103 +1,370 @@
 # Custom 
 #from config import save_env
 import gymnasium_env
+from config import get_env_kwargs, get_model_name
 
 import gymnasium as gym
 import numpy as np
-import pandas as pd
 import time
 
 from stable_baselines3 import DQN, PPO, A2C
-from stable_baselines3.common.callbacks import BaseCallback
-from stable_baselines3.common.monitor import Monitor
-from stable_baselines3.common.results_plotter import load_results, ts2xy
-from stable_baselines3.common.noise import NormalActionNoise
+from stable_baselines3.common.callbacks import BaseCallback, CallbackList
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecMonitor
+from stable_baselines3.common.save_util import save_to_zip_file, recursive_getattr
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import copy
+import csv
 import json
 import os
+import torch
+import torch.nn as nn
 
-class CustomLoggingCallback(BaseCallback):
-    def __init__(self, check_freq: int, log_dir: str, verbose=1):
+"""
+Training metrics computed from the episodes reported by the (Vec)Monitor
+in infos, without reading monitor.csv back:
+    * the mean reward of the last `window` episodes comes from a ring buffer
+    * a row is appended to training_metrics.csv every check_freq calls
+    * the best model is copied on the training thread, then serialized
+      and written to disk by a background thread, so training does not
+      wait for torch.save nor for the file
+The file and the thread are released by close, also called by
+train_model when training raises
+"""
+class StreamingMetricsCallback(BaseCallback):
+    COLUMNS = [
+        "timesteps",
+        "episodes",
+        "avg_steps_per_episode",
+        "mean_reward",
+        "best_mean_reward",
+        "step_duration"
+    ]
+
+    def __init__(self, check_freq: int, log_dir: str, window: int = 100, verbose=1):
         super().__init__(verbose)
         self.check_freq = check_freq
         self.log_dir = log_dir
         self.save_path = os.path.join(log_dir, "best_model")
         self.best_mean_reward = -np.inf
-        self.metrics = []
         self.last_time = time.time()
-        self.df = pd.DataFrame(columns=[
-            "timesteps", 
-            "episodes", 
-            "avg_steps_per_episode", 
-            "mean_reward", 
-            "best_mean_reward",
-            "step_duration"
-        ])
+        # Last episode rewards
+        self.rewards = np.zeros(window, dtype=np.float64)
+        self.n_episodes = 0
+        self.total_episode_steps = 0
+        self.metrics_file = None
+        self.writer = None
+        self.saver = None
 
     def _init_callback(self) -> None:
         # Create folder if needed
         if self.save_path is not None:
             os.makedirs(self.save_path, exist_ok=True)
+        self.metrics_file = open(os.path.join(self.log_dir, "training_metrics.csv"), "w", newline="")
+        self.writer = csv.writer(self.metrics_file)
+        self.writer.writerow(self.COLUMNS)
+        self.saver = ThreadPoolExecutor(max_workers=1)
 
     def _on_step(self) -> bool:
-        if self.n_calls % self.check_freq == 0:
+        for info in self.locals["infos"]:
+            episode = info.get("episode")
+            if episode is not None:
+                self.rewards[self.n_episodes % len(self.rewards)] = episode["r"]
+                self.n_episodes += 1
+                self.total_episode_steps += episode["l"]
+
+        if self.n_calls % self.check_freq == 0 and self.n_episodes > 0:
             start_time = time.time()
-            # Retrieve training reward
-            x, y = ts2xy(load_results(self.log_dir), "timesteps")
-            if len(x) > 0:
-                # Mean training reward over the last 100 episodes
-                mean_reward = np.mean(y[-100:])
-                n_episodes = len(y)
-                avg_steps_per_episode = x[-1] / n_episodes if n_episodes > 0 else 0
-                step_duration = start_time - self.last_time 
+            # Mean training reward over the last episodes
+            mean_reward = self.rewards[:min(self.n_episodes, len(self.rewards))].mean()
+            avg_steps_per_episode = self.total_episode_steps / self.n_episodes
+            step_duration = start_time - self.last_time
+
+            if self.verbose > 0:
+                print(f"Num timesteps: {self.num_timesteps}")
+                print(
+                    f"Best mean reward: {self.best_mean_reward:.2f} - Last mean reward per episode: {mean_reward:.2f}"
+                )
 
+            self.writer.writerow([
+                self.num_timesteps,
+                self.n_episodes,
+                avg_steps_per_episode,
+                mean_reward,
+                self.best_mean_reward,
+                step_duration
+            ])
+            self.metrics_file.flush()
+
+            self.last_time = time.time()
+
+            # New best model
+            if mean_reward > self.best_mean_reward:
+                self.best_mean_reward = mean_reward
                 if self.verbose > 0:
-                    print(f"Num timesteps: {self.num_timesteps}")
-                    print(
-                        f"Best mean reward: {self.best_mean_reward:.2f} - Last mean reward per episode: {mean_reward:.2f}"
-                    )
-
-                new_metrics = {
-                    "timesteps": self.num_timesteps,
-                    "episodes": n_episodes,
-                    "avg_steps_per_episode": avg_steps_per_episode,
-                    "mean_reward": mean_reward,
-                    "best_mean_reward": self.best_mean_reward,
-                    "step_duration": step_duration
-                }
-                self.df = pd.concat([self.df, pd.DataFrame([new_metrics])], ignore_index=True)
-                self.df.to_csv(os.path.join(self.log_dir, "training_metrics.csv"), index=False)
-
-                self.last_time = time.time()
-
-                # New best model, you could save the agent here
-                if mean_reward > self.best_mean_reward:
-                    self.best_mean_reward = mean_reward
-                    # Example for saving best model
-                    if self.verbose > 0:
-                        print(f"Saving new best model to {self.save_path}.zip")
-                    self.model.save(self.save_path)
-                
+                    print(f"Saving new best model to {self.save_path}.zip")
+                self._save_best_model()
+
         return True
 
+    def _save_best_model(self):
+        self.saver.submit(_save_snapshot, self.save_path + ".zip", get_model_snapshot(self.model))
+
+    def _on_training_end(self) -> None:
+        self.close()
+
+    def close(self):
+        # Wait for the pending best model
+        if self.saver is not None:
+            self.saver.shutdown(wait=True)
+            self.saver = None
+        if self.metrics_file is not None:
+            self.metrics_file.close()
+            self.metrics_file = None
+
+
+"""
+Copy of everything model.save writes (the data, the parameters and the
+torch variables), which stays valid while training keeps updating the model
+"""
+def get_model_snapshot(model) -> dict:
+    state_dicts_names, torch_variable_names = model._get_torch_save_params()
+    exclude = set(model._excluded_save_params())
+    exclude.update(name.split(".")[0] for name in state_dicts_names + torch_variable_names)
+    data = {key: value for key, value in model.__dict__.items() if key not in exclude}
+    pytorch_variables = {name: recursive_getattr(model, name) for name in torch_variable_names}
+    return copy.deepcopy({
+        "data": data,
+        "params": model.get_parameters(),
+        "pytorch_variables": pytorch_variables,
+    })
+
+
+# Serialize through a temporary file, so a reader never sees a partial file
+def _save_snapshot(path: str, snapshot: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        save_to_zip_file(f, **snapshot)
+    os.replace(tmp_path, path)
+
+
+"""
+Reports the env-steps/sec of the training, measured over each rollout
+collection (env stepping and the policy inference choosing the actions,
+not the gradient updates) and over the whole run
+"""
+class ThroughputCallback(BaseCallback):
+    def __init__(self, verbose=0):
+        super().__init__(verbose)
+        self.start_time = None
+        self.rollout_start = None
+        self.rollout_timesteps = 0
+
+    def _on_training_start(self) -> None:
+        self.start_time = time.perf_counter()
+
+    def _on_rollout_start(self) -> None:
+        self.rollout_start = time.perf_counter()
+        self.rollout_timesteps = self.num_timesteps
+
+    def _on_rollout_end(self) -> None:
+        elapsed = time.perf_counter() - self.rollout_start
+        if elapsed > 0:
+            self.logger.record("time/rollout_steps_per_sec",
+                               (self.num_timesteps - self.rollout_timesteps) / elapsed)
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_training_end(self) -> None:
+        elapsed = time.perf_counter() - self.start_time
+        if self.verbose > 0 and elapsed > 0:
+            print(f"Trained {self.num_timesteps} timesteps in {elapsed:.1f}s "
+                  f"({self.num_timesteps / elapsed:.0f} steps/s, {self.training_env.num_envs} envs)")
+
 
+ALGORITHMS = {
+    "ppo": PPO,
+    "a2c": A2C,
+    "dqn": DQN,
+}
 
-MODEL_NAME = "maze-ppo-NRGC2R3"
+
+def get_algorithm(name: str):
+    if name not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm {name}, expected one of {list(ALGORITHMS)}")
+    return ALGORITHMS[name]
+
+
+"""
+Convolutional features of the "flat" (C, H, W) and "packed" (2, H, W)
+observation layouts. SB3's NatureCNN needs at least 36x36 inputs (kernel 8,
+stride 4), so the maze grids go through padded 3x3 convolutions instead,
+which keep the grid size whatever it is
+"""
+class MazeCNN(BaseFeaturesExtractor):
+    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 256):
+        super().__init__(observation_space, features_dim)
+        n_input_channels = observation_space.shape[0]
+        self.cnn = nn.Sequential(
+            nn.Conv2d(n_input_channels, 32, kernel_size=3, stride=1, padding=1),
+            nn.ReLU(),
+            nn.Conv2d(32, 64, kernel_size=3, stride=1, padding=1),
+            nn.ReLU(),
+            nn.Flatten(),
+        )
+        n_flatten = 64 * observation_space.shape[1] * observation_space.shape[2]
+        self.linear = nn.Sequential(nn.Linear(n_flatten, features_dim), nn.ReLU())
+
+    def forward(self, observations: torch.Tensor) -> torch.Tensor:
+        return self.linear(self.cnn(observations))
+
+
+POLICIES = ["auto", "mlp", "cnn"]
+
+
+"""
+Policy and policy_kwargs for the observation space of the env:
+    * "mlp": MultiInputPolicy for the "dict" layout, MlpPolicy otherwise
+    * "cnn": CnnPolicy with MazeCNN, "flat" and "packed" layouts only.
+      Their channels are one-hot tiles (high=1) and the heatmap (high up to
+      255), which is not an image for SB3, so normalize_images=False
+      skips its image checks and the division by 255
+    * "auto": "cnn" for the "flat" and "packed" layouts, "mlp" otherwise
+"""
+def get_policy(observation_space, policy: str = "auto"):
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy}, expected one of {POLICIES}")
+    is_grid = isinstance(observation_space, gym.spaces.Box) and len(observation_space.shape) == 3
+    if policy == "auto":
+        policy = "cnn" if is_grid else "mlp"
+    if policy == "cnn":
+        if not is_grid:
+            raise ValueError(f"The cnn policy needs a (C, H, W) Box observation space, got {observation_space}")
+        return "CnnPolicy", dict(features_extractor_class=MazeCNN, normalize_images=False)
+    if isinstance(observation_space, gym.spaces.Dict):
+        return "MultiInputPolicy", None
+    return "MlpPolicy", None
+
+
+MODEL_NAME = get_model_name("ppo")
 LOG_DIR = os.path.join('./results/', MODEL_NAME)
-os.makedirs(LOG_DIR, exist_ok=True)
 
-def train_model():
-    env = gym.make("Maze-v0", render_mode="human")
-    env = Monitor(env, LOG_DIR)
+
+# Cores this process is allowed to run on
+def get_available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
 
 
-    callback = CustomLoggingCallback(
-        check_freq=1000,
-        log_dir=LOG_DIR,
+"""
+Number of env workers, by default one per available core minus the one
+left to the learner in the main process (at least 1). A requested number
+is capped to the available cores
+"""
+def get_num_workers(num_envs=None) -> int:
+    cores = get_available_cores()
+    if num_envs is None:
+        return max(cores - 1, 1)
+    return max(min(num_envs, cores), 1)
+
+
+# Workers are seeded by make_vec_env (seed + worker index), not here
+def make_env(env_id: str = "Maze-v0", env_kwargs=None):
+    def _init():
+        # Workers are single-threaded, the cores are shared among them
+        import torch
+        torch.set_num_threads(1)
+        import gymnasium_env
+        return gym.make(env_id, **(env_kwargs or {}))
+    return _init
+
+
+"""
+Vectorized environment with num_envs workers, each one in its own process
+(started with start_method: "fork", "spawn", "forkserver" or None for the
+platform default). A single env runs in the main process
+"""
+def make_vec_env(num_envs: int,
+                 log_dir: str,
+                 env_id: str = "Maze-v0",
+                 env_kwargs=None,
+                 start_method=None,
+                 seed=None):
+    env_fns = [make_env(env_id, env_kwargs) for _ in range(num_envs)]
+    if num_envs > 1:
+        vec_env = SubprocVecEnv(env_fns, start_method=start_method)
+    else:
+        vec_env = DummyVecEnv(env_fns)
+    if seed is not None:
+        vec_env.seed(seed)
+    # A single monitor.csv for all the workers
+    return VecMonitor(vec_env, log_dir)
+
+
+def train_model(model_name: str = MODEL_NAME,
+                algorithm: str = "ppo",
+                total_timesteps: int = 100_000,
+                num_envs=None,
+                num_threads=None,
+                start_method=None,
+                seed=None,
+                env_id: str = "Maze-v0",
+                env_kwargs=None,
+                log_dir=None,
+                policy: str = "auto"):
+    log_dir = log_dir or os.path.join('./results/', model_name)
+    os.makedirs(log_dir, exist_ok=True)
+
+    num_envs = get_num_workers(num_envs)
+    env = make_vec_env(num_envs, log_dir, env_id, env_kwargs, start_method, seed)
+    # Learner threads, by default the cores left by the env workers
+    torch.set_num_threads(num_threads or max(get_available_cores() - num_envs, 1))
+
+    # The callbacks are called once per vectorized step
+    metrics_callback = StreamingMetricsCallback(
+        check_freq=max(1000 // num_envs, 1),
+        log_dir=log_dir,
     )
+    callback = CallbackList([metrics_callback, ThroughputCallback(verbose=1)])
+
+    policy, policy_kwargs = get_policy(env.observation_space, policy)
+    model = ALGORITHMS[algorithm](policy, env, policy_kwargs=policy_kwargs, device='cpu', seed=seed, verbose=1)
+    try:
+        model.learn(total_timesteps=total_timesteps, callback=callback, log_interval=1000)
+        model.save(model_name)
+    finally:
+        metrics_callback.close()
+        env.close()
+    return model
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train an agent on the PCGRL maze")
+    parser.add_argument("--model-name", default=MODEL_NAME)
+    parser.add_argument("--algorithm", choices=list(ALGORITHMS), default="ppo")
+    parser.add_argument("--policy", choices=POLICIES, default="auto",
+                        help="auto uses the cnn policy for the flat and packed observation layouts")
+    parser.add_argument("--timesteps", type=int, default=100_000)
+    parser.add_argument("--num-envs", type=int, default=None,
+                        help="env workers, defaults to the available cores minus one")
+    parser.add_argument("--start-method", choices=["fork", "spawn", "forkserver"], default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--env-id", default=None,
+                        help="registered preset, defaults to Maze-v0 with the config.py settings")
+    return parser.parse_args()
 
-    model = PPO("MultiInputPolicy", env, device='cpu', verbose=1)
-    model.learn(total_timesteps=100_000, callback=callback, log_interval=1000)
-    model.save(MODEL_NAME)
 
 if __name__ == "__main__":
-    train_model()
+    args = parse_args()
+    train_model(model_name=args.model_name,
+                algorithm=args.algorithm,
+                total_timesteps=args.timesteps,
+                policy=args.policy,
+                num_envs=args.num_envs,
+                start_method=args.start_method,
+                seed=args.seed,
+                env_id=args.env_id or "Maze-v0",
+                env_kwargs=get_env_kwargs() if args.env_id is None else None)